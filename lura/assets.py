@@ -1,5 +1,7 @@
+import shutil
 import sys
 import pkg_resources
+from lura import fs
 from typing import Any, IO, Optional, Sequence
 
 class Assets:
@@ -43,9 +45,13 @@ class Assets:
     return buf.decode(encoding)
 
   def copy(self, src: str, dst: str) -> None:
-    buf = self.load(src)
-    with open(dst, 'wb') as file:
-      file.write(buf)
+    provider = pkg_resources.get_provider(self.package)
+    if isinstance(provider, pkg_resources.DefaultProvider):
+      # the resource is a file
+      fs.copy(pkg_resources.resource_filename(self.package, self.path(src)), dst)
+      return
+    with self.open(src) as srcf, open(dst, 'wb') as dstf:
+      shutil.copyfileobj(srcf, dstf, 1024 * 1024)
 
   def open(self, path: str) -> IO:
     return pkg_resources.resource_stream(self.package, self.path(path))
@@ -1,12 +1,52 @@
-from typing import Any, Optional, TextIO
+'''
+Formats for loading and dumping json, yaml, csv, etc.
+
+Format classes are registered by name and by file extension, and their
+modules, along with the third-party modules they depend on, are imported on
+first use:
+
+```
+>>> from lura import formats
+>>> formats.get('json')
+<class 'lura.formats.json.Json'>
+>>> formats.for_path('conf.yml')().loadf('conf.yml')
+{...}
+```
+
+The format classes are also available as attributes of this package, e.g.
+`formats.Yaml`.
+
+`loadf_many()` loads many files in parallel in a process pool.
+
+The `loadf()` and `dumpf()` functions of all formats transparently
+(de)compress files named with a compression suffix such as `.gz`, `.bz2`,
+`.xz`, or `.zst`, or using the `compression` argument; see `compression`.
+
+The `loads()` functions of all formats also accept bytes-like objects, such
+as the views yielded by `lura.fs.map()`, which are decoded as utf-8 by text
+formats.
+'''
+
+import os
+from importlib import import_module
+from typing import Any, Dict, Optional, Sequence, TextIO, Tuple, Type, Union
 from typing_extensions import Protocol
+from . import compression
+
+# data accepted by loads()
+Data = Union[str, bytes, bytearray, memoryview]
+
+def decode(data: Data, encoding: str = 'utf-8') -> str:
+  'Return `data`, decoded with `encoding` if it is bytes-like.'
+
+  return data if isinstance(data, str) else str(data, encoding)
 
 class Format(Protocol):
   'API implemented by format implementations.'
 
   def loads(
     self,
-    data: str,
+    data: Data,
     **kwargs: Any
   ) -> Any:
   
@@ -16,6 +56,7 @@ class Format(Protocol):
     self,
     path: str,
     encoding: Optional[str] = None,
+    compression: Optional[str] = None,
     **kwargs: Any
   ) -> Any:
   
@@ -42,6 +83,7 @@ class Format(Protocol):
     path: str,
     data: Any,
     encoding: Optional[str] = None,
+    compression: Optional[str] = None,
     **kwargs: Any
   ) -> None:
   
@@ -56,6 +98,89 @@ class Format(Protocol):
   
     ...
 
-from .json import Json
-from .pyaml import Pyaml
-from .yaml import Yaml
+class Registry:
+  'Map format names and file extensions to lazily-imported format classes.'
+
+  _formats: Dict[str, Tuple[str, str]]
+  _extensions: Dict[str, str]
+
+  def __init__(self) -> None:
+    super().__init__()
+    self._formats = {}
+    self._extensions = {}
+
+  def register(
+    self,
+    name: str,
+    module: str,
+    cls: str,
+    extensions: Sequence[str] = (),
+  ) -> None:
+    '''
+    Register the format class `cls` of `module` as `name` and for file
+    `extensions` (e.g. '.yml'). `module` is not imported until the format is
+    first requested.
+    '''
+
+    self._formats[name] = (module, cls)
+    for ext in extensions:
+      self._extensions[ext.lower()] = name
+
+  @property
+  def names(self) -> Sequence[str]:
+    return list(self._formats)
+
+  def get(self, name: str) -> Type[Format]:
+    'Return the format class registered as `name`.'
+
+    try:
+      module, cls = self._formats[name]
+    except KeyError:
+      raise ValueError(f'Unknown format: {name}')
+    return getattr(import_module(module, __name__), cls)
+
+  def name_for_path(self, path: str) -> str:
+    'Return the name of the format registered for the extension of `path`.'
+
+    ext = os.path.splitext(compression.strip(path))[1].lower()
+    try:
+      return self._extensions[ext]
+    except KeyError:
+      raise ValueError(f'No format registered for extension: {path}')
+
+  def for_path(self, path: str) -> Type[Format]:
+    'Return the format class registered for the extension of `path`.'
+
+    return self.get(self.name_for_path(path))
+
+registry = Registry()
+registry.register('csv', '.csv', 'Csv', ('.csv',))
+registry.register('json', '.json', 'Json', ('.json',))
+registry.register('msgpack', '.msgpack', 'Msgpack', ('.msgpack', '.mpk'))
+# pickle is registered by name only, so that files are never unpickled
+# because of their extension
+registry.register('pickle', '.pickle', 'Pickle')
+registry.register('pyaml', '.pyaml', 'Pyaml')
+registry.register('yaml', '.yaml', 'Yaml', ('.yaml', '.yml'))
+
+get = registry.get
+for_path = registry.for_path
+
+# format classes which are available as attributes of this package
+_classes = {
+  'Csv': 'csv',
+  'Json': 'json',
+  'Msgpack': 'msgpack',
+  'Pickle': 'pickle',
+  'Pyaml': 'pyaml',
+  'Yaml': 'yaml',
+}
+
+from .parallel import LoadResult, loadf_many
+
+def __getattr__(name: str) -> Any:
+  if name in _classes:
+    cls = get(_classes[name])
+    globals()[name] = cls
+    return cls
+  raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
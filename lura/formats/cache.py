@@ -0,0 +1,223 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+from types import MappingProxyType
+from typing import Any, Dict, Hashable, Mapping, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+  from lura.formats import Format
+
+# file identity and version as reported by stat()
+Signature = Tuple[int, int, int, int]
+
+def signature(path: str) -> Signature:
+  'Return the `(st_dev, st_ino, st_size, st_mtime_ns)` of `path`.'
+
+  st = os.stat(path)
+  return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+def freeze(value: Any) -> Any:
+  '''
+  Return a read-only view of `value`. Mappings become `MappingProxyType`s,
+  lists and tuples become tuples, and sets become frozensets, recursively.
+  '''
+
+  if isinstance(value, Mapping):
+    return MappingProxyType({k: freeze(v) for (k, v) in value.items()})
+  if isinstance(value, (list, tuple)):
+    return tuple(freeze(v) for v in value)
+  if isinstance(value, (set, frozenset)):
+    return frozenset(value)
+  return value
+
+def sizeof(value: Any, sample: int = 32) -> int:
+  '''
+  Estimate the memory used by `value` and the mappings, sequences, and sets
+  it contains. Only `sample` evenly spaced members of larger containers are
+  measured, and their sizes are scaled to the size of the container, so the
+  cost of the estimate is bounded for large values. Objects shared by
+  containers are counted for each container.
+  '''
+
+  size = 0.0
+  stack = [(value, 1.0)]
+  while stack:
+    (value, weight) = stack.pop()
+    size += sys.getsizeof(value) * weight
+    if isinstance(value, Mapping):
+      members = list(value.keys()) + list(value.values())
+    elif isinstance(value, (list, tuple)):
+      members = value
+    elif isinstance(value, (set, frozenset)):
+      members = list(value)
+    else:
+      continue
+    count = len(members)
+    if count > sample:
+      step = count / sample
+      members = [members[int(i * step)] for i in range(sample)]
+      weight *= count / sample
+    stack.extend((member, weight) for member in members)
+  return int(size)
+
+class _Entry:
+
+  __slots__ = ('signature', 'value', 'size')
+
+  signature: Signature
+  value: Any
+  size: int
+
+  def __init__(self, signature: Signature, value: Any, size: int) -> None:
+    super().__init__()
+    self.signature = signature
+    self.value = value
+    self.size = size
+
+class Cache:
+  '''
+  LRU cache for files parsed by `Format.loadf()`.
+
+  Example:
+
+    > from lura.formats import Yaml
+    > from lura.formats.cache import Cache
+    > cache = Cache()
+    > conf = cache.loadf(Yaml(), 'conf.yaml')
+
+  Entries are keyed on the format class, the absolute path, and the load
+  arguments, and are validated against the file's `(st_dev, st_ino, st_size,
+  st_mtime_ns)` on every lookup, so the file is parsed again only when it has
+  been replaced or modified.
+
+  The cache is bounded by `max_entries` and by `max_bytes`, which is compared
+  to the sum of the estimated in-memory sizes of the cached values (see
+  `sizeof()`), not to the sizes of the files, which may be compressed.
+  Either bound may be None.
+
+  When `copy` is True, `loadf()` returns a deep copy of the cached value which
+  the caller may modify. When `copy` is False, `loadf()` returns a shared
+  read-only view of the value; see `freeze()`.
+  '''
+
+  max_entries: Optional[int]
+  max_bytes: Optional[int]
+  copy: bool
+  hits: int
+  misses: int
+  evictions: int
+
+  _entries: 'OrderedDict[Hashable, _Entry]'
+  _bytes: int
+  _lock: threading.Lock
+
+  def __init__(
+    self,
+    max_entries: Optional[int] = 128,
+    max_bytes: Optional[int] = 64 * 1024 * 1024,
+    copy: bool = True,
+  ) -> None:
+
+    super().__init__()
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.copy = copy
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._entries = OrderedDict()
+    self._bytes = 0
+    self._lock = threading.Lock()
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  @property
+  def bytes(self) -> int:
+    'The sum of the estimated sizes of the cached values.'
+
+    return self._bytes
+
+  @property
+  def stats(self) -> Dict[str, int]:
+    'Cache metrics.'
+
+    with self._lock:
+      return dict(
+        entries = len(self._entries),
+        bytes = self._bytes,
+        hits = self.hits,
+        misses = self.misses,
+        evictions = self.evictions,
+      )
+
+  def loadf(
+    self,
+    format: 'Format',
+    path: str,
+    encoding: Optional[str] = None,
+    **kwargs: Any
+  ) -> Any:
+    'Return `format.loadf(path, encoding, **kwargs)`, parsing only on a miss.'
+
+    path = os.path.abspath(path)
+    key = (type(format), path, encoding, repr(sorted(kwargs.items())))
+    # stat before parsing so that a change made while parsing causes a miss
+    # on the next lookup
+    sig = signature(path)
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and entry.signature == sig:
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._export(entry.value)
+      self.misses += 1
+    value = format.loadf(path, encoding, **kwargs)
+    if not self.copy:
+      value = freeze(value)
+    size = sizeof(value)
+    with self._lock:
+      self._remove(key)
+      self._entries[key] = _Entry(sig, value, size)
+      self._bytes += size
+      self._prune()
+    return self._export(value)
+
+  def invalidate(self, path: Optional[str] = None) -> None:
+    'Remove all entries for `path`, or all entries if `path` is None.'
+
+    with self._lock:
+      if path is None:
+        self._entries.clear()
+        self._bytes = 0
+        return
+      path = os.path.abspath(path)
+      for key in [key for key in self._entries if key[1] == path]: # type: ignore
+        self._remove(key)
+
+  def clear(self) -> None:
+    'Remove all entries and reset metrics.'
+
+    with self._lock:
+      self._entries.clear()
+      self._bytes = 0
+      self.hits = self.misses = self.evictions = 0
+
+  def _export(self, value: Any) -> Any:
+    return deepcopy(value) if self.copy else value
+
+  def _remove(self, key: Hashable) -> None:
+    entry = self._entries.pop(key, None)
+    if entry is not None:
+      self._bytes -= entry.size
+
+  def _prune(self) -> None:
+    while self._entries and (
+      (self.max_entries is not None and len(self._entries) > self.max_entries) or
+      (self.max_bytes is not None and self._bytes > self.max_bytes)
+    ):
+      (_, entry) = self._entries.popitem(last=False)
+      self._bytes -= entry.size
+      self.evictions += 1
@@ -0,0 +1,80 @@
+'''
+Transparent compressed file streams for format load and dump functions.
+
+Compression is detected from the file suffix, or may be given explicitly:
+
+| Compression | Suffixes        | Module                                     |
+| ----------- | --------------- | ------------------------------------------ |
+| `gzip`      | `.gz`           | `gzip`                                     |
+| `bz2`       | `.bz2`          | `bz2`                                      |
+| `lzma`      | `.xz`, `.lzma`  | `lzma`                                     |
+| `zstd`      | `.zst`          | `compression.zstd` or `zstandard` (pypi)   |
+| `none`      |                 |                                            |
+'''
+
+import builtins
+import os
+from typing import IO, Optional
+
+suffixes = {
+  '.gz': 'gzip',
+  '.bz2': 'bz2',
+  '.xz': 'lzma',
+  '.lzma': 'lzma',
+  '.zst': 'zstd',
+}
+
+def detect(path: str) -> str:
+  'Return the compression of `path` based on its suffix.'
+
+  ext = os.path.splitext(path)[1].lower()
+  return suffixes.get(ext, 'none')
+
+def strip(path: str) -> str:
+  'Return `path` without its compression suffix, if any.'
+
+  root, ext = os.path.splitext(path)
+  return root if ext.lower() in suffixes else path
+
+def open(
+  path: str,
+  mode: str = 'r',
+  encoding: Optional[str] = None,
+  compression: Optional[str] = None,
+  newline: Optional[str] = None,
+) -> IO:
+  '''
+  Open `path` like `open()`, compressing or decompressing the stream when
+  `compression` is given or, if `compression` is None, when the suffix of
+  `path` names a compression.
+  '''
+
+  if compression is None:
+    compression = detect(path)
+  if compression == 'none':
+    if 'b' in mode:
+      return builtins.open(path, mode)
+    return builtins.open(path, mode, encoding=encoding, newline=newline)
+  if 'b' not in mode and 't' not in mode:
+    mode += 't'
+  if 'b' in mode:
+    encoding = newline = None
+  if compression == 'gzip':
+    import gzip
+    return gzip.open(path, mode, encoding=encoding, newline=newline)
+  if compression == 'bz2':
+    import bz2
+    return bz2.open(path, mode, encoding=encoding, newline=newline)
+  if compression == 'lzma':
+    import lzma
+    return lzma.open(path, mode, encoding=encoding, newline=newline)
+  if compression == 'zstd':
+    try:
+      from compression import zstd # type: ignore
+    except ImportError:
+      try:
+        import zstandard as zstd # type: ignore
+      except ImportError:
+        raise ValueError('zstd compression requires the zstandard package')
+    return zstd.open(path, mode, encoding=encoding, newline=newline)
+  raise ValueError(f'Unsupported compression: {compression}')
@@ -1,7 +1,216 @@
 import ast
 import io
 import csv as pycsv
-from typing import Any, Callable, Optional, Mapping, Sequence, TextIO, cast
+import re
+from array import array
+from collections import namedtuple
+from itertools import chain, islice
+from lura.formats import Data, decode
+from lura.formats.compression import open as _open
+from typing import (
+  Any, Callable, Dict, Iterable, Iterator, List, Optional, Mapping, Sequence,
+  TextIO, Union, cast
+)
+
+#####
+## type inference
+
+# fast paths for the literals most commonly found in csv data. each pattern
+# accepts only strings for which int() or float() return the same value as
+# ast.literal_eval(). anything else takes the slow path.
+_digits = r'[0-9](?:_?[0-9])*'
+_exponent = rf'[eE][-+]?{_digits}'
+_int_re = re.compile(rf'[-+]?(?:0(?:_?0)*|[1-9](?:_?[0-9])*)\Z')
+_float_re = re.compile(
+  rf'[-+]?(?:(?:{_digits})?\.{_digits}(?:{_exponent})?'
+  rf'|{_digits}\.(?:{_exponent})?'
+  rf'|{_digits}{_exponent})\Z'
+)
+# digit strings which are not matched by _int_re (e.g. with leading zeros)
+# are never literals
+_digits_re = re.compile(r'[0-9_]+\Z')
+
+# values which are always literals
+_constants = {'True': True, 'False': False, 'None': None}
+
+# characters which may begin a string accepted by ast.literal_eval()
+_literal_starts = frozenset('0123456789.+-\'"[({ \t\n\r\x0c#\\TFNbBrRuU')
+_numeric_starts = frozenset('0123456789.+-')
+_prefix_starts = frozenset('bBrRuU')
+_quotes = frozenset('\'"')
+
+def literal(value: Any) -> Any:
+  '''
+  Return `value` evaluated as a literal, or `value` if it is not a literal.
+
+  This is equivalent to calling `ast.literal_eval()` and returning the naked
+  value on failure, but avoids invoking the parser for plain integers,
+  floats, constants, and strings which cannot be literals.
+  '''
+
+  if not value or value.__class__ is not str:
+    return value
+  char = value[0]
+  if char in _numeric_starts:
+    if _int_re.match(value):
+      return int(value)
+    if _float_re.match(value):
+      return float(value)
+    if _digits_re.match(value):
+      return value
+  elif value in _constants:
+    return _constants[value]
+  elif char not in _literal_starts or value.isidentifier():
+    # bare names are never literals
+    return value
+  elif char in _prefix_starts and _quotes.isdisjoint(value[1:3]):
+    # string prefixes must be followed by a quote or a second prefix
+    return value
+  try:
+    return ast.literal_eval(value)
+  except (ValueError, SyntaxError):
+    return value
+
+def _int(value: Any) -> Any:
+  if value.__class__ is str and _int_re.match(value):
+    return int(value)
+  return literal(value)
+
+def _float(value: Any) -> Any:
+  if value.__class__ is str and _float_re.match(value):
+    return float(value)
+  return literal(value)
+
+def _bool(value: Any) -> Any:
+  if value == 'True':
+    return True
+  if value == 'False':
+    return False
+  return literal(value)
+
+def _none(value: Any) -> Any:
+  if value == 'None':
+    return None
+  return literal(value)
+
+def _naked(value: Any) -> Any:
+  return value
+
+class Inference:
+  '''
+  Per-column type inference.
+
+  `train()` inspects a sample of the values of a column and locks in a
+  converter for the column's type (int, float, bool, None, or str). The
+  converter tests each value with a cheap check for the chosen type and
+  falls back to `literal()` only when a value doesn't fit, so results are
+  always the same as evaluating every value with `ast.literal_eval()`.
+  '''
+
+  _by_type = {
+    int: _int,
+    float: _float,
+    bool: _bool,
+    type(None): _none,
+  }
+
+  infer: bool
+  typemap: Mapping[str, Callable]
+  _converters: Dict[Any, Callable]
+
+  def __init__(
+    self,
+    infer: bool = True,
+    typemap: Mapping[str, Callable] = {},
+  ) -> None:
+
+    super().__init__()
+    self.infer = infer
+    self.typemap = typemap
+    self._converters = {}
+
+  def train(self, field: Any, values: Iterable[Any]) -> None:
+    'Choose the converter for `field` using a sample of its values.'
+
+    if field in self.typemap or not self.infer:
+      return
+    types = {type(literal(value)) for value in values if value != ''}
+    if types == {int, float}:
+      types = {float}
+    if len(types) == 1:
+      self._converters[field] = self._by_type.get(types.pop(), literal)
+
+  def converter(self, field: Any) -> Callable[[Any], Any]:
+    'Return the value converter for `field`.'
+
+    if field in self.typemap:
+      # always use the mapped type if present
+      return self.typemap[field]
+    if not self.infer:
+      # return the naked value if not inferring
+      return _naked
+    return self._converters.get(field, literal)
+
+#####
+## columnar storage
+
+class _Column:
+  '''
+  Column storage which starts as a compact `array('q')`, widens to
+  `array('d')` when a float is appended, and falls back to a `list` when a
+  value of any other type is appended.
+  '''
+
+  __slots__ = ('data',)
+
+  data: Union[array, List[Any]]
+
+  def __init__(self) -> None:
+    super().__init__()
+    self.data = array('q')
+
+  def append(self, value: Any) -> None:
+    data = self.data
+    kind = value.__class__
+    if data.__class__ is list:
+      data.append(value)
+    elif kind is int and data.typecode == 'q': # type: ignore
+      try:
+        data.append(value)
+      except OverflowError:
+        self._widen(list).append(value)
+    elif kind is float:
+      if data.typecode == 'q': # type: ignore
+        data = self._widen(float)
+      data.append(value)
+    elif kind is int:
+      # the column is array('d'). ints of greater magnitude do not convert to
+      # float exactly, or at all
+      if -2**53 <= value <= 2**53:
+        data.append(value)
+      else:
+        self._widen(list).append(value)
+    else:
+      self._widen(list).append(value)
+
+  def _widen(self, kind: type) -> Any:
+    if kind is float and all(-2**53 <= value <= 2**53 for value in self.data):
+      # ints of this magnitude convert to float exactly
+      self.data = array('d', self.data)
+    else:
+      self.data = list(self.data)
+    return self.data
+
+  def finish(self, numpy: bool) -> Any:
+    data = self.data
+    if not numpy or data.__class__ is list:
+      return data
+    import numpy as np # type: ignore
+    dtype = np.int64 if data.typecode == 'q' else np.float64 # type: ignore
+    return np.frombuffer(data, dtype=dtype)
+
+#####
+## csv format
 
 class Csv:
   '''
@@ -9,33 +218,59 @@ class Csv:
 
   Load support is implemented by `csv.DictReader`.
 
-  Dump functions are currently not implemented.
+  Dump support is implemented by `csv.DictWriter` for rows which are
+  mappings and by `csv.writer` for rows which are sequences. Rows may be any
+  iterable and are written in batches of `batch` rows (default 1000). The
+  header is taken from `fieldnames` if given, else from the keys of the first
+  row (or the `_fields` of namedtuple rows). Pass header=False to omit it.
 
-  Load-time type inference is implemented by `ast.literal_eval()` and can
-  be disabled:
+  Load-time type inference is equivalent to `ast.literal_eval()`. The first
+  `sample` rows (default 100) are used to choose a fast converter for each
+  column; see `Inference`. Inference can be disabled:
 
   1. for all fields by passing infer=False to the load function
   2. for a particular field by passing a type conversion callable for the
      field via `typemap` (e.g. `lambda _: _` to return the naked value).
+
+  Rows may be loaded lazily using the `iterload*` functions, which accept
+  the same arguments as the `load*` functions. The `rowtype` argument
+  selects the type of the yielded rows:
+
+  - 'dict' (default), rows are dicts as produced by `csv.DictReader`
+  - 'tuple', rows are tuples of values in field order
+  - 'record', rows are namedtuples with a field per column
+
+  Tuples and records use much less memory per row than dicts. For these row
+  types, short rows are padded with `restval`, and the extra values of long
+  rows are collected in a trailing `restkey` field if `restkey` is given, or
+  are discarded otherwise.
+
+  The `loadcolumns*` functions return a dict mapping each field name to a
+  column of values instead of a sequence of rows. Integer columns are
+  returned as `array('q')`, float columns as `array('d')`, and all other
+  columns as lists. Pass `numpy=True` to return numeric columns as numpy
+  arrays, and `columns` to load only the named fields. Any empty or
+  non-numeric value in a column makes it a list.
   '''
 
   def loads(
     self,
-    data: str,
+    data: Data,
     **kwargs: Any
   ) -> Sequence[Mapping[str, Any]]:
 
-    with io.StringIO(data) as buf:
+    with io.StringIO(decode(data)) as buf:
       return self.loadfd(buf, **kwargs)
 
   def loadf(
     self,
     path: str,
     encoding: Optional[str] = None,
+    compression: Optional[str] = None,
     **kwargs: Any
   ) -> Sequence[Mapping[str, Any]]:
 
-    with open(path, 'r', encoding=encoding) as fd:
+    with _open(path, 'r', encoding=encoding, compression=compression) as fd:
       return self.loadfd(fd, **kwargs)
 
   def loadfd(
@@ -43,39 +278,151 @@ class Csv:
     fd: TextIO,
     **kwargs: Any
   ) -> Sequence[Mapping[str, Any]]:
-  
+
+    return list(self.iterloadfd(fd, **kwargs))
+
+  def iterloads(
+    self,
+    data: Data,
+    **kwargs: Any
+  ) -> Iterator[Any]:
+
+    with io.StringIO(decode(data)) as buf:
+      yield from self.iterloadfd(buf, **kwargs)
+
+  def iterloadf(
+    self,
+    path: str,
+    encoding: Optional[str] = None,
+    compression: Optional[str] = None,
+    **kwargs: Any
+  ) -> Iterator[Any]:
+
+    with _open(path, 'r', encoding=encoding, compression=compression) as fd:
+      yield from self.iterloadfd(fd, **kwargs)
+
+  def iterloadfd(
+    self,
+    fd: TextIO,
+    **kwargs: Any
+  ) -> Iterator[Any]:
+
     infer = cast(bool, kwargs.get('infer', True))
     typemap = cast(Mapping[str, Callable], kwargs.get('typemap', {}))
     fieldnames = cast(Sequence[str], kwargs.get('fieldnames', []))
     restkey = cast(Optional[str], kwargs.get('restkey'))
     restval = cast(Optional[str], kwargs.get('restval'))
     dialect = cast(str, kwargs.get('dialect', 'excel'))
-    reader = pycsv.DictReader(
-      fd, fieldnames=fieldnames, restkey=restkey, restval=restval, dialect=dialect)
-    rows = []
-    for row in reader:
-      for field in row:
-        row[field] = self._value(field, row[field], infer, typemap)
-      rows.append(row)
-    return rows
+    rowtype = cast(str, kwargs.get('rowtype', 'dict'))
+    sample = cast(int, kwargs.get('sample', 100))
+    inference = Inference(infer, typemap)
+    if rowtype == 'dict':
+      reader = pycsv.DictReader(
+        fd, fieldnames=fieldnames or None, restkey=restkey, restval=restval,
+        dialect=dialect)
+      head = list(islice(reader, sample))
+      for field in (reader.fieldnames or ()):
+        inference.train(field, (row.get(field) for row in head))
+      converters: Dict[Any, Callable] = {}
+      for row in chain(head, reader):
+        for field in row:
+          try:
+            converter = converters[field]
+          except KeyError:
+            converter = converters[field] = inference.converter(field)
+          row[field] = converter(row[field])
+        yield row
+    elif rowtype in ('tuple', 'record'):
+      yield from self._itertuples(
+        fd, rowtype, inference, sample, fieldnames, restkey, restval, dialect)
+    else:
+      raise ValueError(f'Unsupported rowtype: {rowtype}')
+
+  def loadcolumns(
+    self,
+    data: Data,
+    **kwargs: Any
+  ) -> Mapping[str, Any]:
+
+    with io.StringIO(decode(data)) as buf:
+      return self.loadcolumnsfd(buf, **kwargs)
+
+  def loadcolumnsf(
+    self,
+    path: str,
+    encoding: Optional[str] = None,
+    compression: Optional[str] = None,
+    **kwargs: Any
+  ) -> Mapping[str, Any]:
+
+    with _open(path, 'r', encoding=encoding, compression=compression) as fd:
+      return self.loadcolumnsfd(fd, **kwargs)
+
+  def loadcolumnsfd(
+    self,
+    fd: TextIO,
+    **kwargs: Any
+  ) -> Mapping[str, Any]:
+
+    infer = cast(bool, kwargs.get('infer', True))
+    typemap = cast(Mapping[str, Callable], kwargs.get('typemap', {}))
+    fieldnames = cast(Sequence[str], kwargs.get('fieldnames', []))
+    restval = cast(Optional[str], kwargs.get('restval'))
+    dialect = cast(str, kwargs.get('dialect', 'excel'))
+    sample = cast(int, kwargs.get('sample', 100))
+    columns = cast(Optional[Sequence[str]], kwargs.get('columns'))
+    numpy = cast(bool, kwargs.get('numpy', False))
+    reader = pycsv.reader(fd, dialect=dialect)
+    if not fieldnames:
+      fieldnames = next(reader, None) or []
+    if columns is None:
+      columns = fieldnames
+    missing = [name for name in columns if name not in fieldnames]
+    if missing:
+      raise ValueError(f'Unknown columns: {missing}')
+    indexes = [list(fieldnames).index(name) for name in columns]
+    # skip blank lines like DictReader
+    rows = (row for row in reader if row)
+    head = list(islice(rows, sample))
+    inference = Inference(infer, typemap)
+    for (name, index) in zip(columns, indexes):
+      inference.train(name, (row[index] for row in head if len(row) > index))
+    targets = [
+      (index, inference.converter(name), _Column())
+      for (name, index) in zip(columns, indexes)
+    ]
+    for row in chain(head, rows):
+      width = len(row)
+      for (index, converter, column) in targets:
+        column.append(converter(row[index] if index < width else restval))
+    return {
+      name: column.finish(numpy)
+      for (name, (_, _, column)) in zip(columns, targets)
+    }
 
   def dumps(
     self,
     data: Any,
     **kwargs: Any,
   ) -> str:
-    
-    raise NotImplementedError()
+
+    with io.StringIO() as buf:
+      self.dumpfd(buf, data, **kwargs)
+      return buf.getvalue()
 
   def dumpf(
     self,
     path: str,
     data: Any,
     encoding: Optional[str] = None,
+    compression: Optional[str] = None,
     **kwargs: Any
   ) -> None:
-  
-    raise NotImplementedError()
+
+    with _open(
+      path, 'w', encoding=encoding, compression=compression, newline=''
+    ) as fd:
+      self.dumpfd(fd, data, **kwargs)
 
   def dumpfd(
     self,
@@ -83,26 +430,69 @@ class Csv:
     data: Any,
     **kwargs: Any
   ) -> None:
-  
-    raise NotImplementedError()
 
-  def _value(
+    fieldnames = cast(Optional[Sequence[str]], kwargs.get('fieldnames'))
+    header = cast(bool, kwargs.get('header', True))
+    restval = cast(Any, kwargs.get('restval', ''))
+    extrasaction = cast(str, kwargs.get('extrasaction', 'raise'))
+    dialect = cast(str, kwargs.get('dialect', 'excel'))
+    batch = cast(int, kwargs.get('batch', 1000))
+    rows = iter(data)
+    first = next(rows, None)
+    writer: Any
+    if isinstance(first, Mapping):
+      if not fieldnames:
+        fieldnames = list(first)
+      writer = pycsv.DictWriter(
+        fd, fieldnames, restval=restval, extrasaction=extrasaction,
+        dialect=dialect)
+    else:
+      if not fieldnames:
+        fieldnames = getattr(first, '_fields', None)
+      writer = pycsv.writer(fd, dialect=dialect)
+    if header and fieldnames:
+      pycsv.writer(fd, dialect=dialect).writerow(fieldnames)
+    if first is None:
+      return
+    rows = chain((first,), rows)
+    while True:
+      chunk = list(islice(rows, batch))
+      if not chunk:
+        break
+      writer.writerows(chunk)
+
+  def _itertuples(
     self,
-    name: str,
-    value: Any,
-    infer: bool,
-    typemap: Mapping[str, Callable]
-  ) -> Any:
+    fd: TextIO,
+    rowtype: str,
+    inference: Inference,
+    sample: int,
+    fieldnames: Sequence[str],
+    restkey: Optional[str],
+    restval: Optional[str],
+    dialect: str,
+  ) -> Iterator[Any]:
 
-    if typemap and name in typemap:
-      # always use the mapped type if present
-      return typemap[name](value)
-    if not infer:
-      # return the naked value if not inferring
-      return value
-    try:
-      # evaluate the value as a literal
-      return ast.literal_eval(value)
-    except (ValueError, SyntaxError):
-      # return the naked value if it can't be eval'd
-      return value
+    reader = pycsv.reader(fd, dialect=dialect)
+    if not fieldnames:
+      fieldnames = next(reader, None) or []
+    fields = list(fieldnames)
+    width = len(fields)
+    if restkey is not None:
+      fields.append(restkey)
+    make: Callable = tuple
+    if rowtype == 'record':
+      make = namedtuple('Record', fields, rename=True)._make # type: ignore
+    # skip blank lines like DictReader
+    rows = (row for row in reader if row)
+    head = list(islice(rows, sample))
+    for (index, field) in enumerate(fieldnames):
+      inference.train(field, (row[index] for row in head if len(row) > index))
+    converters = [inference.converter(field) for field in fieldnames]
+    for row in chain(head, rows):
+      values = [converter(value) for (converter, value) in zip(converters, row)]
+      if len(row) < width:
+        values.extend(converter(restval) for converter in converters[len(row):])
+      if restkey is not None:
+        values.append(row[width:])
+      yield make(values)
@@ -1,41 +1,147 @@
+import datetime
+import io
 import json as pyjson
-from typing import Any, Callable, Optional, TextIO
+from base64 import b64encode
+from dataclasses import fields, is_dataclass
+from decimal import Decimal
+from enum import Enum
+from lura.attrs import attr
+from lura.formats import Data, decode, jsonstream
+from lura.formats.compression import open as _open
+from typing import Any, Callable, Dict, Iterator, Optional, TextIO
+
+def _list(item: Any) -> Any:
+  return list(item)
+
+def _isoformat(item: Any) -> Any:
+  return item.isoformat()
+
+def _enum(item: Any) -> Any:
+  return item.value
+
+def _attr(item: Any) -> Any:
+  return item.__wrapped__
+
+def _base64(item: Any) -> Any:
+  return b64encode(item).decode('ascii')
+
+def _dataclass(item: Any) -> Any:
+  return {field.name: getattr(item, field.name) for field in fields(item)}
+
+def _numpy(item: Any) -> Any:
+  # works for both numpy scalars and arrays
+  return item.tolist()
 
 class Encoder(pyjson.JSONEncoder):
+  '''
+  Json encoder with a registry of handlers for types which json can't encode
+  natively.
+
+  The handler for a type is found by walking the type's MRO, and the result
+  is cached per type. Handlers may return any value which can be encoded,
+  including values which themselves need a handler. Dataclasses and numpy
+  values are handled when no handler is registered for their types, and all
+  other values are encoded as `str(value)`.
+
+  Example:
 
-  def __init__(self, *args, **kwargs):
-    super().__init__(*args, **kwargs)
+    > Encoder.register(ipaddress.IPv4Network, str)
+  '''
 
-  def default(self, item):
-    if isinstance(item, set):
-      return list(item)
-    elif hasattr(item, '__str__'):
-      return str(item)
+  handlers: Dict[type, Callable[[Any], Any]] = {
+    set: _list,
+    frozenset: _list,
+    datetime.date: _isoformat,
+    datetime.datetime: _isoformat,
+    datetime.time: _isoformat,
+    Enum: _enum,
+    attr: _attr,
+    bytes: _base64,
+    bytearray: _base64,
+    memoryview: _base64,
+    Decimal: str,
+  }
+
+  _handler_cache: Dict[type, Callable[[Any], Any]] = {}
+
+  # incremented by every register() call. each class's cache is valid only
+  # for the version it was built at, since a class may inherit the registry
+  # of any of its bases
+  _registry_version = 0
+  _handler_cache_version = 0
+
+  @classmethod
+  def register(cls, kind: type, handler: Callable[[Any], Any]) -> None:
+    'Register `handler` for values of type `kind` and its subclasses.'
+
+    if 'handlers' not in vars(cls):
+      # subclasses get their own registry
+      cls.handlers = dict(cls.handlers)
+    cls.handlers[kind] = handler
+    Encoder._registry_version += 1
+
+  @classmethod
+  def handler(cls, kind: type) -> Callable[[Any], Any]:
+    'Return the handler for values of type `kind`.'
+
+    if (
+      '_handler_cache' not in vars(cls) or
+      cls._handler_cache_version != Encoder._registry_version
+    ):
+      cls._handler_cache = {}
+      cls._handler_cache_version = Encoder._registry_version
+    try:
+      return cls._handler_cache[kind]
+    except KeyError:
+      pass
+    handlers = cls.handlers
+    for base in kind.__mro__:
+      if base in handlers:
+        handler = handlers[base]
+        break
     else:
-      return repr(item)
+      if is_dataclass(kind):
+        handler = _dataclass
+      elif kind.__module__.split('.', 1)[0] == 'numpy' and hasattr(kind, 'tolist'):
+        handler = _numpy
+      else:
+        handler = str
+    cls._handler_cache[kind] = handler
+    return handler
+
+  def default(self, item: Any) -> Any:
+    return self.handler(type(item))(item)
 
 class Json:
-  'Json format.'
+  '''
+  Json format.
+
+  The `iterload*` functions parse documents incrementally and yield only the
+  values found at `prefix`, e.g. `items.item.metadata.name` or
+  `$.items[*].metadata.name`, so that peak memory use is proportional to one
+  value rather than to the whole document. See `jsonstream`.
+  '''
 
   object_pairs_hook: Callable = dict
 
   def loads(
     self,
-    data: str,
+    data: Data,
     **kwargs: Any
   ) -> Any:
 
     kwargs.setdefault('object_pairs_hook', self.object_pairs_hook)
-    return pyjson.loads(data, **kwargs)
+    return pyjson.loads(decode(data), **kwargs)
 
   def loadf(
     self,
     path: str,
     encoding: Optional[str] = None,
+    compression: Optional[str] = None,
     **kwargs: Any
   ) -> Any:
 
-    with open(path, encoding=encoding) as fd:
+    with _open(path, encoding=encoding, compression=compression) as fd:
       return self.loadfd(fd, **kwargs)
 
   def loadfd(
@@ -47,6 +153,38 @@ class Json:
     kwargs.setdefault('object_pairs_hook', self.object_pairs_hook)
     return pyjson.load(fd, **kwargs)
 
+  def iterloads(
+    self,
+    data: Data,
+    prefix: str = '',
+    **kwargs: Any
+  ) -> Iterator[Any]:
+
+    with io.StringIO(decode(data)) as buf:
+      yield from self.iterloadfd(buf, prefix, **kwargs)
+
+  def iterloadf(
+    self,
+    path: str,
+    prefix: str = '',
+    encoding: Optional[str] = None,
+    compression: Optional[str] = None,
+    **kwargs: Any
+  ) -> Iterator[Any]:
+
+    with _open(path, encoding=encoding, compression=compression) as fd:
+      yield from self.iterloadfd(fd, prefix, **kwargs)
+
+  def iterloadfd(
+    self,
+    fd: TextIO,
+    prefix: str = '',
+    **kwargs: Any
+  ) -> Iterator[Any]:
+
+    kwargs.setdefault('object_pairs_hook', self.object_pairs_hook)
+    return jsonstream.items(fd, prefix, **kwargs)
+
   def dumps(
     self,
     data: Any,
@@ -61,10 +199,11 @@ class Json:
     path: str,
     data: Any,
     encoding: Optional[str] = None,
+    compression: Optional[str] = None,
     **kwargs: Any
   ) -> None:
   
-    with open(path, 'w', encoding=encoding) as fd:
+    with _open(path, 'w', encoding=encoding, compression=compression) as fd:
       self.dumpfd(fd, data, **kwargs)
 
   def dumpfd(
@@ -0,0 +1,266 @@
+'''
+Incremental, event-based json parser.
+
+Documents are read from a file object in chunks, so memory use is bounded by
+the largest token or extracted item rather than by the document size.
+
+`basic_parse()` yields `(event, value)` tuples, `parse()` additionally
+yields the prefix of each event, and `items()` yields the values found at a
+prefix:
+
+```
+>>> from lura.formats.jsonstream import items
+>>> with open('pods.json') as fd:
+...   for name in items(fd, 'items.item.metadata.name'):
+...     print(name)
+```
+
+Events are `start_map`, `map_key`, `end_map`, `start_array`, `end_array`,
+`string`, `number`, `boolean`, and `null`.
+
+Prefixes are dot-separated map keys, with array members named `item`, as
+in `ijson`. The root value has the empty prefix. Simple JSONPath
+expressions such as `$.items[*].metadata.name` are also accepted.
+'''
+
+import re
+from json import JSONDecodeError
+from json.decoder import scanstring # type: ignore
+from typing import Any, Callable, Iterator, List, Optional, TextIO, Tuple
+
+# one token, preceded by whitespace. the groups are punctuation, a string
+# without escapes, a string with escapes, a number, its fraction, its
+# exponent, and a literal
+_token_re = re.compile(
+  r'[ \t\n\r]*(?:'
+  r'([{}\[\],:])'
+  r'|"([^"\\\x00-\x1f]*)"'
+  r'|("(?:[^"\\\x00-\x1f]|\\.)*")'
+  r'|(-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?)'
+  r'|(true|false|null|NaN|Infinity|-Infinity)'
+  r')'
+)
+_ws_re = re.compile(r'[ \t\n\r]*')
+
+# literal tokens, their events, and their values
+_literals = {
+  'true': ('boolean', True),
+  'false': ('boolean', False),
+  'null': ('null', None),
+  'NaN': ('number', float('nan')),
+  'Infinity': ('number', float('inf')),
+  '-Infinity': ('number', float('-inf')),
+}
+
+# tokens are read again after reading more data when fewer than this many
+# characters remain in the buffer, so that no short token is split
+_margin = 64
+
+def _tokens(fd: TextIO, buflen: int) -> Iterator[Tuple[str, Any, int]]:
+  'Yield `(kind, value, offset)` for each token read from `fd`.'
+
+  buf = ''
+  pos = 0     # position in buf
+  offset = 0  # offset of buf in the stream
+  eof = False
+  match_token = _token_re.match
+
+  def more() -> bool:
+    nonlocal buf, pos, offset, eof
+    if eof:
+      return False
+    # read at least as much as is buffered so long tokens are rescanned a
+    # logarithmic number of times
+    data = fd.read(max(buflen, len(buf) - pos))
+    if not data:
+      eof = True
+      return False
+    offset += pos
+    buf = buf[pos:] + data
+    pos = 0
+    return True
+
+  while True:
+    if len(buf) - pos < _margin and more():
+      continue
+    match = match_token(buf, pos)
+    if match is None:
+      start = _ws_re.match(buf, pos).end() # type: ignore
+      if start == len(buf):
+        if more():
+          continue
+        return
+      if (len(buf) - start < _margin or buf[start] in '"-0123456789') and more():
+        # the token may continue in the next chunk
+        continue
+      raise JSONDecodeError('Expecting value', buf, start)
+    (punct, plain, escaped, number, frac, exp, literal) = match.groups()
+    end = match.end()
+    if punct is not None:
+      yield (punct, None, offset + end - 1)
+    elif plain is not None:
+      yield ('string', plain, offset + end - len(plain) - 2)
+    elif escaped is not None:
+      yield ('string', scanstring(escaped, 1, True)[0], offset + end - len(escaped))
+    elif number is not None:
+      if len(buf) - end < 3 and more():
+        # the number may continue in the next chunk
+        continue
+      value = float(number) if frac or exp else int(number)
+      yield ('number', value, offset + end - len(number))
+    else:
+      (kind, value) = _literals[literal]
+      yield (kind, value, offset + end - len(literal))
+    pos = end
+
+# parser states
+_VALUE = 0          # expecting a value
+_VALUE_OR_END = 1   # expecting a value or ]
+_KEY = 2            # expecting a key
+_KEY_OR_END = 3     # expecting a key or }
+_COLON = 4          # expecting :
+_COMMA_OR_END = 5   # expecting , or the end of the current container
+_DONE = 6           # expecting the end of the document
+
+_scalars = frozenset(('string', 'number', 'boolean', 'null'))
+
+def basic_parse(
+  fd: TextIO,
+  buflen: int = 64 * 1024,
+) -> Iterator[Tuple[str, Any]]:
+  'Yield `(event, value)` for each event in the document read from `fd`.'
+
+  stack: List[str] = []
+  state = _VALUE
+
+  def fail(kind: str, offset: int) -> JSONDecodeError:
+    return JSONDecodeError(f'Unexpected token {kind!r}', '', offset)
+
+  for (kind, value, offset) in _tokens(fd, buflen):
+    if state == _VALUE or state == _VALUE_OR_END:
+      if kind in _scalars:
+        yield (kind, value)
+        state = _COMMA_OR_END if stack else _DONE
+      elif kind == '{':
+        stack.append('{')
+        yield ('start_map', None)
+        state = _KEY_OR_END
+      elif kind == '[':
+        stack.append('[')
+        yield ('start_array', None)
+        state = _VALUE_OR_END
+      elif kind == ']' and state == _VALUE_OR_END:
+        stack.pop()
+        yield ('end_array', None)
+        state = _COMMA_OR_END if stack else _DONE
+      else:
+        raise fail(kind, offset)
+    elif state == _KEY or state == _KEY_OR_END:
+      if kind == 'string':
+        yield ('map_key', value)
+        state = _COLON
+      elif kind == '}' and state == _KEY_OR_END:
+        stack.pop()
+        yield ('end_map', None)
+        state = _COMMA_OR_END if stack else _DONE
+      else:
+        raise fail(kind, offset)
+    elif state == _COLON:
+      if kind != ':':
+        raise fail(kind, offset)
+      state = _VALUE
+    elif state == _COMMA_OR_END:
+      top = stack[-1]
+      if kind == ',':
+        state = _KEY if top == '{' else _VALUE
+      elif kind == '}' and top == '{':
+        stack.pop()
+        yield ('end_map', None)
+        state = _COMMA_OR_END if stack else _DONE
+      elif kind == ']' and top == '[':
+        stack.pop()
+        yield ('end_array', None)
+        state = _COMMA_OR_END if stack else _DONE
+      else:
+        raise fail(kind, offset)
+    else:
+      raise fail(kind, offset)
+  if state != _DONE:
+    raise JSONDecodeError('Unexpected end of document', '', 0)
+
+def parse(
+  fd: TextIO,
+  buflen: int = 64 * 1024,
+) -> Iterator[Tuple[str, str, Any]]:
+  'Yield `(prefix, event, value)` for each event in the document read from `fd`.'
+
+  # prefixes of the enclosing containers, and of the current value
+  prefixes: List[str] = []
+  prefix = ''
+  for (event, value) in basic_parse(fd, buflen):
+    if event == 'map_key':
+      parent = prefixes[-1]
+      yield (parent, event, value)
+      prefix = f'{parent}.{value}' if parent else value
+    elif event == 'start_map' or event == 'start_array':
+      yield (prefix, event, value)
+      prefixes.append(prefix)
+      if event == 'start_array':
+        prefix = f'{prefix}.item' if prefix else 'item'
+    elif event == 'end_map' or event == 'end_array':
+      prefix = prefixes.pop()
+      yield (prefix, event, value)
+    else:
+      yield (prefix, event, value)
+
+def normalize(prefix: str) -> str:
+  'Convert a JSONPath expression such as `$.a[*].b` to a prefix.'
+
+  if not prefix.startswith('$'):
+    return prefix
+  return prefix[1:].replace('[*]', '.item').lstrip('.')
+
+def _build(
+  events: Iterator[Tuple[str, str, Any]],
+  object_pairs_hook: Callable,
+) -> Any:
+  'Build the container whose start event was just consumed from `events`.'
+
+  # each frame is a list of values for arrays, or a list of pairs for maps
+  stack: List[List[Any]] = [[]]
+  keys: List[Optional[str]] = [None]
+  for (_, event, value) in events:
+    if event == 'map_key':
+      keys[-1] = value
+      continue
+    if event == 'start_map' or event == 'start_array':
+      stack.append([])
+      keys.append(None)
+      continue
+    if event == 'end_map' or event == 'end_array':
+      frame = stack.pop()
+      keys.pop()
+      value = object_pairs_hook(frame) if event == 'end_map' else frame
+      if not stack:
+        return value
+    key = keys[-1]
+    stack[-1].append(value if key is None else (key, value))
+  raise JSONDecodeError('Unexpected end of document', '', 0)
+
+def items(
+  fd: TextIO,
+  prefix: str = '',
+  buflen: int = 64 * 1024,
+  object_pairs_hook: Callable = dict,
+) -> Iterator[Any]:
+  'Yield each value at `prefix` in the document read from `fd`.'
+
+  prefix = normalize(prefix)
+  events = parse(fd, buflen)
+  for (current, event, value) in events:
+    if current != prefix or event in ('map_key', 'end_map', 'end_array'):
+      continue
+    if event == 'start_map' or event == 'start_array':
+      yield _build(events, object_pairs_hook)
+    else:
+      yield value
@@ -0,0 +1,84 @@
+import msgpack as pymsgpack # type: ignore
+from lura.formats.compression import open as _open
+from lura.formats.json import Encoder
+from typing import Any, BinaryIO, Optional
+
+def _default(item: Any) -> Any:
+  return Encoder.handler(type(item))(item)
+
+class Msgpack:
+  '''
+  Binary format implemented using msgpack.
+
+  Values which msgpack can't encode natively are converted using the
+  handlers registered with the json `Encoder`, e.g. datetimes are encoded as
+  ISO 8601 strings. Unlike json, bytes are encoded natively.
+  '''
+
+  def loads(
+    self,
+    data: bytes,
+    **kwargs: Any
+  ) -> Any:
+
+    self._load_kwargs(kwargs)
+    return pymsgpack.unpackb(data, **kwargs)
+
+  def loadf(
+    self,
+    path: str,
+    encoding: Optional[str] = None,
+    compression: Optional[str] = None,
+    **kwargs: Any
+  ) -> Any:
+
+    with _open(path, 'rb', compression=compression) as fd:
+      return self.loadfd(fd, **kwargs)
+
+  def loadfd(
+    self,
+    fd: BinaryIO,
+    **kwargs: Any
+  ) -> Any:
+
+    self._load_kwargs(kwargs)
+    return pymsgpack.unpack(fd, **kwargs)
+
+  def dumps(
+    self,
+    data: Any,
+    **kwargs: Any,
+  ) -> bytes:
+
+    self._dump_kwargs(kwargs)
+    return pymsgpack.packb(data, **kwargs)
+
+  def dumpf(
+    self,
+    path: str,
+    data: Any,
+    encoding: Optional[str] = None,
+    compression: Optional[str] = None,
+    **kwargs: Any
+  ) -> None:
+
+    with _open(path, 'wb', compression=compression) as fd:
+      self.dumpfd(fd, data, **kwargs)
+
+  def dumpfd(
+    self,
+    fd: BinaryIO,
+    data: Any,
+    **kwargs: Any
+  ) -> None:
+
+    self._dump_kwargs(kwargs)
+    pymsgpack.pack(data, fd, **kwargs)
+
+  def _load_kwargs(self, kwargs: Any) -> None:
+    kwargs.setdefault('raw', False)
+    kwargs.setdefault('strict_map_key', False)
+
+  def _dump_kwargs(self, kwargs: Any) -> None:
+    kwargs.setdefault('use_bin_type', True)
+    kwargs.setdefault('default', _default)
@@ -0,0 +1,86 @@
+import os
+from concurrent import futures
+from typing import Any, Iterable, Iterator, Mapping, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+  from lura.formats import Format
+
+class LoadResult:
+  'The result of loading one file with `loadf_many()`.'
+
+  path: str                      # path of the file
+  value: Any                     # loaded value, or None on error
+  error: Optional[BaseException] # exception raised while loading, or None
+
+  def __init__(
+    self,
+    path: str,
+    value: Any = None,
+    error: Optional[BaseException] = None,
+  ) -> None:
+
+    super().__init__()
+    self.path = path
+    self.value = value
+    self.error = error
+
+  def __repr__(self) -> str:
+    state = 'ok' if self.error is None else repr(self.error)
+    return f'<{type(self).__name__} {self.path}: {state}>'
+
+  @property
+  def ok(self) -> bool:
+    return self.error is None
+
+def _loadf(
+  format: Optional['Format'],
+  path: str,
+  encoding: Optional[str],
+  kwargs: Mapping[str, Any],
+) -> Any:
+
+  if format is None:
+    from lura.formats import for_path
+    format = for_path(path)()
+  return format.loadf(path, encoding, **kwargs)
+
+def loadf_many(
+  paths: Iterable[str],
+  format: Optional['Format'] = None,
+  encoding: Optional[str] = None,
+  workers: Optional[int] = None,
+  ordered: bool = True,
+  **kwargs: Any
+) -> Iterator[LoadResult]:
+  '''
+  Load files in parallel in a pool of `workers` processes (default: one per
+  cpu) and yield a `LoadResult` for each file.
+
+  Files are loaded with `format`, or with the format registered for the
+  extension of each file if `format` is None. Results are yielded in the
+  order of `paths` if `ordered` is True, else as they complete. An error
+  loading one file is reported in its result and does not stop the batch.
+  '''
+
+  paths = list(paths)
+  if not paths:
+    return
+  workers = min(workers or os.cpu_count() or 1, len(paths))
+  with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+    pending = {
+      pool.submit(_loadf, format, path, encoding, kwargs): path
+      for path in paths
+    }
+    try:
+      completed = pending if ordered else futures.as_completed(pending)
+      for future in completed:
+        path = pending[future]
+        error = future.exception()
+        if error is None:
+          yield LoadResult(path, value=future.result())
+        else:
+          yield LoadResult(path, error=error)
+    finally:
+      # don't parse the remaining files if the caller stops iterating
+      for future in pending:
+        future.cancel()
@@ -0,0 +1,92 @@
+import pickle as pypickle
+from lura.formats.compression import open as _open
+from typing import Any, BinaryIO, Optional
+
+class Pickle:
+  '''
+  Binary format implemented using pickle.
+
+  Data is pickled using the highest protocol available, which is protocol 5
+  on Python 3.8 and later. Never load pickles from untrusted sources. For
+  this reason, pickle is not selected by file extension, e.g. by
+  `formats.for_path()`, and must be requested by name.
+
+  Protocol 5 supports out-of-band buffers. Wrap large bytes-like values in
+  `pickle.PickleBuffer` and pass a list as `buffers` to `dumps()`, and the
+  values will be appended to the list rather than copied into the pickle:
+
+    > buffers = []
+    > data = Pickle().dumps({'blob': pickle.PickleBuffer(blob)}, buffers=buffers)
+    > Pickle().loads(data, buffers=buffers)
+
+  The buffers may then be shipped separately (e.g. through shared memory).
+  The loaded value references the objects passed as `buffers` to `loads()`
+  in place of the wrapped values, without copying them; use `memoryview()`
+  to access their contents.
+  '''
+
+  protocol: int = pypickle.HIGHEST_PROTOCOL
+
+  def loads(
+    self,
+    data: bytes,
+    **kwargs: Any
+  ) -> Any:
+
+    return pypickle.loads(data, **kwargs)
+
+  def loadf(
+    self,
+    path: str,
+    encoding: Optional[str] = None,
+    compression: Optional[str] = None,
+    **kwargs: Any
+  ) -> Any:
+
+    with _open(path, 'rb', compression=compression) as fd:
+      return self.loadfd(fd, **kwargs)
+
+  def loadfd(
+    self,
+    fd: BinaryIO,
+    **kwargs: Any
+  ) -> Any:
+
+    return pypickle.load(fd, **kwargs)
+
+  def dumps(
+    self,
+    data: Any,
+    **kwargs: Any,
+  ) -> bytes:
+
+    self._kwargs(kwargs)
+    return pypickle.dumps(data, **kwargs)
+
+  def dumpf(
+    self,
+    path: str,
+    data: Any,
+    encoding: Optional[str] = None,
+    compression: Optional[str] = None,
+    **kwargs: Any
+  ) -> None:
+
+    with _open(path, 'wb', compression=compression) as fd:
+      self.dumpfd(fd, data, **kwargs)
+
+  def dumpfd(
+    self,
+    fd: BinaryIO,
+    data: Any,
+    **kwargs: Any
+  ) -> None:
+
+    self._kwargs(kwargs)
+    pypickle.dump(data, fd, **kwargs)
+
+  def _kwargs(self, kwargs: Any) -> None:
+    kwargs.setdefault('protocol', self.protocol)
+    buffers = kwargs.pop('buffers', None)
+    if buffers is not None:
+      kwargs['buffer_callback'] = buffers.append
@@ -1,7 +1,128 @@
 import io
-import pyaml # type: ignore
+import json
+import math
+import re
 from enum import Enum
-from typing import Any, Optional, TextIO
+from lura.formats import Data
+from lura.formats.compression import open as _open
+from typing import Any, List, Mapping, Optional, TextIO
+
+# strings which can be written as plain scalars without being read back as
+# another type or breaking the yaml syntax
+_plain_re = re.compile(r'[A-Za-z_/][-\w./@%+=,()]*(?: [-\w./@%+=,()]+)*\Z')
+_ambiguous = frozenset(
+  ('true', 'false', 'yes', 'no', 'on', 'off', 'y', 'n', 'null'))
+
+class _Writer:
+  '''
+  A fast writer for human-friendly yaml. Mappings and sequences are written
+  in block style, multi-line strings as literal block scalars, and numbers
+  unquoted. Strings longer than `truncate` characters are truncated.
+  '''
+
+  truncate: Optional[int]
+
+  def __init__(self, truncate: Optional[int] = None) -> None:
+    super().__init__()
+    self.truncate = truncate
+
+  def dumps(self, data: Any) -> str:
+    if self._nested(data):
+      lines = self._block(data, 0)
+    else:
+      lines = self._entry('', data, 0)
+      lines[0] = lines[0].lstrip()
+    lines.append('')
+    return '\n'.join(lines)
+
+  def _nested(self, value: Any) -> bool:
+    return bool(value) and isinstance(value, (Mapping, list, tuple, set))
+
+  def _block(self, value: Any, indent: int) -> List[str]:
+    pad = ' ' * indent
+    lines: List[str] = []
+    if isinstance(value, Mapping):
+      for (key, item) in value.items():
+        lines.extend(self._entry(f'{pad}{self._inline(key)}:', item, indent))
+    else:
+      for item in value:
+        if self._nested(item):
+          sub = self._block(item, indent + 2)
+          sub[0] = f'{pad}- {sub[0][indent + 2:]}'
+          lines.extend(sub)
+        else:
+          lines.extend(self._entry(f'{pad}-', item, indent))
+    return lines
+
+  def _entry(self, prefix: str, value: Any, indent: int) -> List[str]:
+    if self._nested(value):
+      return [prefix] + self._block(value, indent + 2)
+    if isinstance(value, bytes):
+      value = value.decode('utf-8', 'backslashreplace')
+    if isinstance(value, str):
+      value = self._truncate(value)
+      lines = self._literal(value, indent + 2)
+      if lines is not None:
+        lines[0] = f'{prefix} {lines[0]}'
+        return lines
+    return [f'{prefix} {self._inline(value)}']
+
+  def _truncate(self, value: str) -> str:
+    if self.truncate is None or len(value) <= self.truncate:
+      return value
+    count = len(value) - self.truncate
+    return f'{value[:self.truncate]}... [{count} characters truncated]'
+
+  def _literal(self, value: str, indent: int) -> Optional[List[str]]:
+    'Return `value` as a literal block scalar, or None if it is unsuitable.'
+
+    if '\n' not in value:
+      return None
+    body = value[:-1] if value.endswith('\n') else value
+    lines = body.split('\n')
+    if (
+      not body.strip() or
+      not body.replace('\n', '').replace('\t', '').isprintable() or
+      any(line.isspace() for line in lines)
+    ):
+      return None
+    if not value.endswith('\n'):
+      chomp = '-'
+    elif value.endswith('\n\n'):
+      chomp = '+'
+    else:
+      chomp = ''
+    # an indentation indicator is needed when content begins with a space
+    first = next(line for line in lines if line)
+    header = f'|2{chomp}' if first.startswith(' ') else f'|{chomp}'
+    pad = ' ' * indent
+    return [header] + [f'{pad}{line}' if line else '' for line in lines]
+
+  def _inline(self, value: Any) -> str:
+    if value is None:
+      return 'null'
+    if value is True or value is False:
+      return 'true' if value else 'false'
+    if isinstance(value, Enum):
+      value = value.value
+    if isinstance(value, int):
+      return str(value)
+    if isinstance(value, float):
+      if math.isnan(value):
+        return '.nan'
+      if math.isinf(value):
+        return '.inf' if value > 0 else '-.inf'
+      return repr(value)
+    if isinstance(value, (Mapping, list, tuple, set)):
+      # empty collections
+      return '{}' if isinstance(value, Mapping) else '[]'
+    if not isinstance(value, str):
+      value = str(value)
+    if _plain_re.match(value) and value.lower() not in _ambiguous:
+      return value
+    if value.isprintable():
+      return "'" + value.replace("'", "''") + "'"
+    return json.dumps(value)
 
 class Pyaml:
   '''
@@ -11,11 +132,17 @@ class Pyaml:
   module would consider to be incorrect (e.g. '123' is printed 123, an integer
   and not a string), however the output is much more suitable for human
   consumption.
+
+  Pass fast=True to the dump functions to use a much faster built-in writer
+  instead of `pyaml`. Its output is similar in style, with multi-line
+  strings written as block scalars and numbers unquoted, but strings are
+  quoted where needed to be read back correctly. Pass `truncate` to
+  truncate strings longer than `truncate` characters.
   '''
 
   def loads(
     self,
-    data: str,
+    data: Data,
     **kwargs: Any
   ) -> Any:
 
@@ -25,6 +152,7 @@ class Pyaml:
     self,
     path: str,
     encoding: Optional[str] = None,
+    compression: Optional[str] = None,
     **kwargs: Any
   ) -> Any:
 
@@ -45,8 +173,10 @@ class Pyaml:
     **kwargs: Any,
   ) -> str:
 
+    if kwargs.get('fast'):
+      return _Writer(kwargs.get('truncate')).dumps(data)
     with io.StringIO() as buf:
-      self.dumpfd(buf, data)
+      self.dumpfd(buf, data, **kwargs)
       return buf.getvalue()
 
   def dumpf(
@@ -54,11 +184,12 @@ class Pyaml:
     path: str,
     data: Any,
     encoding: Optional[str] = None,
+    compression: Optional[str] = None,
     **kwargs: Any
   ) -> None:
 
-    with open(path, 'w', encoding=encoding) as fd:
-      self.dumpfd(fd, data)
+    with _open(path, 'w', encoding=encoding, compression=compression) as fd:
+      self.dumpfd(fd, data, **kwargs)
 
   def dumpfd(
     self,
@@ -67,6 +198,10 @@ class Pyaml:
     **kwargs: Any
   ) -> None:
   
+    if kwargs.get('fast'):
+      fd.write(_Writer(kwargs.get('truncate')).dumps(data))
+      return
+    import pyaml # type: ignore
     pyaml.p(data, file=fd, sort_dicts=False)
 
   def print(self, data: Any, **kwargs) -> None:
@@ -1,6 +1,7 @@
 import sys
 import yaml
-
+from lura.formats import Data, decode
+from lura.formats.compression import open as _open
 from typing import Any, Optional, TextIO
 
 class Yaml:
@@ -8,24 +9,25 @@ class Yaml:
 
   def loads(
     self,
-    data: str,
+    data: Data,
     **kwargs: Any
   ) -> Any:
   
     kwargs.setdefault('Loader', yaml.SafeLoader)
-    return yaml.load(data, **kwargs)
+    return yaml.load(decode(data), **kwargs)
 
   def loadf(
     self,
     path: str,
     encoding: Optional[str] = None,
+    compression: Optional[str] = None,
     **kwargs: Any
   ) -> Any:
 
     kwargs.setdefault('Loader', yaml.SafeLoader)
     if encoding is None:
       encoding = sys.getdefaultencoding()  
-    with open(path, encoding=encoding) as pathf:
+    with _open(path, encoding=encoding, compression=compression) as pathf:
       return yaml.load(pathf, **kwargs)
 
   def loadfd(
@@ -50,12 +52,13 @@ class Yaml:
     path: str,
     data: Any,
     encoding: Optional[str] = None,
+    compression: Optional[str] = None,
     **kwargs: Any
   ) -> None:
   
     if encoding is None:
       encoding = sys.getdefaultencoding()
-    with open(path, 'w', encoding=encoding) as pathf:
+    with _open(path, 'w', encoding=encoding, compression=compression) as pathf:
       yaml.dump(data, pathf)
 
   def dumpfd(
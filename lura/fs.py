@@ -1,11 +1,27 @@
+import atexit
+import ctypes
+import errno
+import glob
 import logging
+import mmap
 import os
+import queue
+import select
+import struct
 import sys
 import shutil
+import stat
 import tempfile
+import threading
 from lura import utils
-from time import sleep
-from typing import Any, Callable, Generator, Optional, cast
+from lura.threads import Thread
+from time import monotonic, sleep
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from typing import (
+  Any, BinaryIO, Callable, Dict, Generator, Iterable, Iterator, List,
+  MutableMapping, Optional, Sequence, Set, Tuple, Union, cast
+)
 
 log = logging.getLogger(__name__)
 
@@ -36,29 +52,747 @@ def appends(path: str, data: str, encoding: Optional[str] = None) -> None:
   with open(path, 'a', encoding=encoding) as pathf:
     pathf.write(data)
 
+class Appender:
+  '''
+  Long-lived buffered writer which appends to a file.
+
+  Example:
+
+    > with Appender('audit.log', interval=0.1, fsync=1.0) as log:
+    >   log.write('record\\n')
+
+  Written data is buffered and appended to the file in one `write()` when
+  at least `bufsize` bytes are buffered, or when data has been buffered for
+  `interval` seconds or more, as checked by `write()`. If `background` is
+  True, a background thread also flushes the buffer every `interval`
+  seconds, so data is not held indefinitely when writes stop.
+
+  `fsync` sets when flushed data is synced to disk: never if None, after
+  every flush if 0, or after a flush when `fsync` seconds or more have
+  passed since the last sync.
+
+  Writes from multiple threads are safe, and each `write()` is appended
+  intact. Data which could not be written is kept and written by the next
+  flush. Appenders which are not closed are closed when the interpreter
+  exits, so buffered data is not lost. The file is reopened if it is
+  renamed or removed, e.g. by log rotation. Strings are encoded with
+  `encoding`.
+  '''
+
+  path: str
+  encoding: str
+  bufsize: int
+  interval: Optional[float]
+  fsync: Optional[float]
+
+  _fd: int
+  _ident: Tuple[int, int]
+  _buf: List[bytes]
+  _buflen: int
+  _buftime: float     # time the first buffered data was written
+  _synctime: float    # time of the last sync
+  _unsynced: bool
+  _lock: threading.Lock     # guards the buffer
+  _io_lock: threading.Lock  # guards the file, and orders flushes
+  _stop: threading.Event
+  _thread: Optional[Thread]
+
+  def __init__(
+    self,
+    path: str,
+    encoding: Optional[str] = None,
+    bufsize: int = 64 * 1024,
+    interval: Optional[float] = 1.0,
+    fsync: Optional[float] = None,
+    background: bool = False,
+  ) -> None:
+
+    super().__init__()
+    if background and not interval:
+      raise ValueError('background flushing requires an interval')
+    self.path = path
+    self.encoding = encoding or sys.getdefaultencoding()
+    self.bufsize = bufsize
+    self.interval = interval
+    self.fsync = fsync
+    self._fd = -1
+    self._buf = []
+    self._buflen = 0
+    self._buftime = 0.0
+    self._synctime = monotonic()
+    self._unsynced = False
+    self._lock = threading.Lock()
+    self._io_lock = threading.Lock()
+    self._stop = threading.Event()
+    self._open()
+    self._thread = None
+    atexit.register(self.close)
+    if background:
+      self._thread = Thread.spawn(
+        target=self._flusher, name=f'Appender <{path}>', daemon=True)
+
+  def __enter__(self) -> 'Appender':
+    return self
+
+  def __exit__(self, *exc_info: utils.ExcInfo) -> None:
+    self.close()
+
+  @property
+  def closed(self) -> bool:
+    return self._fd < 0
+
+  def _open(self) -> None:
+    self._fd = os.open(
+      self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o666)
+    st = os.fstat(self._fd)
+    self._ident = (st.st_dev, st.st_ino)
+
+  def _reopen(self) -> None:
+    'Reopen the file if it was renamed or removed.'
+
+    try:
+      st = os.stat(self.path)
+      if (st.st_dev, st.st_ino) == self._ident:
+        return
+    except FileNotFoundError:
+      pass
+    log.debug(f'Reopening rotated file: {self.path}')
+    fd = self._fd
+    self._open()
+    os.close(fd)
+
+  def write(self, data: Union[str, bytes]) -> int:
+    'Buffer `data`, flushing the buffer if required.'
+
+    buf = data.encode(self.encoding) if isinstance(data, str) else bytes(data)
+    with self._lock:
+      if self._fd < 0:
+        raise ValueError(f'I/O operation on closed appender: {self.path}')
+      if not self._buf:
+        self._buftime = monotonic()
+      self._buf.append(buf)
+      self._buflen += len(buf)
+      flush = self._buflen >= self.bufsize or (
+        self.interval is not None and
+        monotonic() - self._buftime >= self.interval
+      )
+    if flush:
+      self.flush()
+    return len(data)
+
+  def flush(self) -> None:
+    'Append the buffered data to the file, and sync it if required.'
+
+    self._flush(False)
+
+  def sync(self) -> None:
+    'Append the buffered data to the file and sync it to disk.'
+
+    self._flush(True)
+
+  def _flush(self, sync: bool) -> None:
+    with self._io_lock:
+      with self._lock:
+        buf = b''.join(self._buf)
+        buftime = self._buftime
+        self._buf = []
+        self._buflen = 0
+      if self._fd < 0:
+        return
+      if buf:
+        view = memoryview(buf)
+        try:
+          self._reopen()
+          self._unsynced = True
+          while view:
+            view = view[os.write(self._fd, view):]
+        except BaseException:
+          # keep the unwritten data, ahead of data buffered since, so it is
+          # written by the next flush
+          with self._lock:
+            self._buf.insert(0, bytes(view))
+            self._buflen += len(view)
+            self._buftime = buftime
+          raise
+      if self._unsynced and (sync or (
+        self.fsync is not None and
+        monotonic() - self._synctime >= self.fsync
+      )):
+        os.fsync(self._fd)
+        self._synctime = monotonic()
+        self._unsynced = False
+
+  def _flusher(self) -> None:
+    while not self._stop.wait(self.interval):
+      try:
+        self.flush()
+      except Exception:
+        log.exception(f'Failed to flush {self.path}')
+
+  def close(self) -> None:
+    'Flush the buffer, sync if any sync policy is set, and close the file.'
+
+    atexit.unregister(self.close)
+    if self._thread is not None:
+      self._stop.set()
+      self._thread.join()
+      self._thread = None
+    self._flush(self.fsync is not None)
+    with self._io_lock:
+      if self._fd >= 0:
+        os.close(self._fd)
+        self._fd = -1
+
+# madvise() advice by name
+_advice = {
+  'normal': 'MADV_NORMAL',
+  'random': 'MADV_RANDOM',
+  'sequential': 'MADV_SEQUENTIAL',
+  'willneed': 'MADV_WILLNEED',
+  'dontneed': 'MADV_DONTNEED',
+  'hugepage': 'MADV_HUGEPAGE',
+}
+
+@contextmanager
+def map(
+  path: str,
+  advice: Union[None, str, Sequence[str]] = None,
+) -> Iterator[memoryview]:
+  '''
+  Map a file into memory and yield a read-only memoryview of its contents.
+
+  The view shares the page cache with other processes mapping the file, and
+  may be passed to format `loads()` functions and to `lura.hash` functions
+  without copying the file. It is released on exit, and must not be used
+  afterward.
+
+  `advice` names one or more `madvise()` hints for the mapping: `normal`,
+  `random`, `sequential`, `willneed`, `dontneed`, or `hugepage`. Hints
+  which are not supported by the platform are ignored.
+  '''
+
+  if isinstance(advice, str):
+    advice = [advice]
+  for name in advice or ():
+    if name not in _advice:
+      raise ValueError(f'Unsupported advice: {name}')
+  with open(path, 'rb') as file:
+    if os.fstat(file.fileno()).st_size == 0:
+      # empty files cannot be mapped
+      yield memoryview(b'')
+      return
+    data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+  try:
+    if hasattr(data, 'madvise'):
+      for name in advice or ():
+        flag = getattr(mmap, _advice[name], None)
+        if flag is not None:
+          data.madvise(flag)
+    with memoryview(data) as view:
+      yield view
+  finally:
+    try:
+      data.close()
+    except BufferError:
+      # slices of the view are still referenced. the map is closed when
+      # they are collected
+      pass
+
+# ioctl request number of FICLONE from linux/fs.h
+_FICLONE = 0x40049409
+
+# errnos meaning a copy method is unsupported for the given files
+_unsupported = frozenset((
+  errno.EBADF, errno.EINVAL, errno.ENOSYS, errno.ENOTSUP, errno.ENOTTY,
+  errno.EOPNOTSUPP, errno.EPERM, errno.EXDEV,
+))
+
+def copy(src: str, dst: str) -> None:
+  '''
+  Copy the contents of file `src` to file `dst`, using the fastest method
+  available: a reflink (FICLONE), `copy_file_range()`, `sendfile()`, or
+  chunked reads and writes.
+  '''
+
+  try:
+    if os.path.samefile(src, dst):
+      raise shutil.SameFileError(f'{src!r} and {dst!r} are the same file')
+  except FileNotFoundError:
+    pass
+  with open(src, 'rb') as srcf, open(dst, 'wb') as dstf:
+    infd = srcf.fileno()
+    outfd = dstf.fileno()
+    try:
+      import fcntl
+    except ImportError:
+      # not available on windows
+      pass
+    else:
+      try:
+        fcntl.ioctl(outfd, _FICLONE, infd)
+        return
+      except OSError as exc:
+        if exc.errno not in _unsupported:
+          raise
+    size = max(os.fstat(infd).st_size, 1024 * 1024)
+    # each method continues from the file offsets left by the previous one
+    if hasattr(os, 'copy_file_range'):
+      try:
+        while os.copy_file_range(infd, outfd, size):
+          pass
+        return
+      except OSError as exc:
+        if exc.errno not in _unsupported:
+          raise
+    if hasattr(os, 'sendfile'):
+      try:
+        while os.sendfile(outfd, infd, None, size): # type: ignore
+          pass
+        return
+      except OSError as exc:
+        if exc.errno not in _unsupported:
+          raise
+    shutil.copyfileobj(srcf, dstf, 1024 * 1024)
+
+class _Inotify:
+  '''
+  Minimal ctypes binding to Linux inotify which watches directories for
+  changes to their entries. Raises `OSError` if inotify is unavailable.
+  '''
+
+  IN_MODIFY = 0x2
+  IN_ATTRIB = 0x4
+  IN_CLOSE_WRITE = 0x8
+  IN_MOVED_FROM = 0x40
+  IN_MOVED_TO = 0x80
+  IN_CREATE = 0x100
+  IN_DELETE = 0x200
+  IN_Q_OVERFLOW = 0x4000
+
+  mask = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE
+  )
+
+  _event = struct.Struct('iIII') # wd, mask, cookie, len
+
+  _libc: Any
+  _fd: int
+  _watches: Dict[int, str]
+
+  def __init__(self) -> None:
+    super().__init__()
+    try:
+      self._libc = ctypes.CDLL(None, use_errno=True)
+      self._libc.inotify_init1
+    except (OSError, AttributeError):
+      raise OSError(errno.ENOSYS, 'inotify is not available')
+    self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if self._fd < 0:
+      self._raise()
+    self._watches = {}
+
+  def _raise(self) -> None:
+    code = ctypes.get_errno()
+    raise OSError(code, os.strerror(code))
+
+  def watch(self, dir: str) -> None:
+    'Watch the entries of directory `dir`.'
+
+    if dir in self._watches.values():
+      return
+    wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir), self.mask)
+    if wd < 0:
+      self._raise()
+    self._watches[wd] = dir
+
+  def wait(self, timeout: Optional[float]) -> Optional[Set[str]]:
+    '''
+    Wait up to `timeout` seconds for events and return the paths they concern,
+    or None if events were lost and any watched path may have changed.
+    '''
+
+    paths: Set[str] = set()
+    if not select.select([self._fd], [], [], timeout)[0]:
+      return paths
+    overflow = False
+    while True:
+      try:
+        data = os.read(self._fd, 64 * 1024)
+      except BlockingIOError:
+        break
+      pos = 0
+      while pos < len(data):
+        (wd, mask, _, size) = self._event.unpack_from(data, pos)
+        pos += self._event.size
+        name = data[pos:pos + size].rstrip(b'\0')
+        pos += size
+        if mask & self.IN_Q_OVERFLOW:
+          overflow = True
+        elif wd in self._watches:
+          paths.add(os.path.join(self._watches[wd], os.fsdecode(name)))
+    return None if overflow else paths
+
+  def close(self) -> None:
+    if self._fd >= 0:
+      os.close(self._fd)
+      self._fd = -1
+
+def _inotify() -> Optional[_Inotify]:
+  'Return an `_Inotify`, or None if inotify is unavailable.'
+
+  try:
+    return _Inotify()
+  except OSError as exc:
+    log.debug(f'Polling for file changes: {exc}')
+    return None
+
+class _Follower:
+  '''
+  Read the lines appended to a file, following it across truncation and
+  across rotation by rename or delete and recreate, as `tail -F` does.
+  '''
+
+  buflen = 64 * 1024
+
+  path: str
+  encoding: str
+  # the identity of a replaced file and the offset at which it was drained
+  drained: Optional[Tuple[Tuple[int, int], int]]
+
+  _file: Optional[BinaryIO]
+  _ident: Optional[Tuple[int, int]]
+  _pos: int    # offset of the end of the data read from _file
+  _buf: bytes  # data read after the last complete line
+
+  def __init__(self, path: str, encoding: Optional[str] = None) -> None:
+    super().__init__()
+    self.path = path
+    self.encoding = encoding or sys.getdefaultencoding()
+    self.drained = None
+    self._file = None
+    self._ident = None
+    self._pos = 0
+    self._buf = b''
+
+  @property
+  def ident(self) -> Optional[Tuple[int, int]]:
+    'The `(st_dev, st_ino)` of the open file.'
+
+    return self._ident if self._file is not None else None
+
+  @property
+  def offset(self) -> int:
+    'The offset of the end of the last complete line read.'
+
+    return self._pos - len(self._buf)
+
+  def open(self, offset: int = 0) -> bool:
+    '''
+    Open the file at `offset`, or at the start if the file is smaller than
+    `offset`. Return False if the file does not exist.
+    '''
+
+    self.close()
+    try:
+      file = open(self.path, 'rb', buffering=0)
+    except FileNotFoundError:
+      return False
+    st = os.fstat(file.fileno())
+    self._file = cast(BinaryIO, file)
+    self._ident = (st.st_dev, st.st_ino)
+    self._pos = offset if offset <= st.st_size else 0
+    self._buf = b''
+    file.seek(self._pos)
+    return True
+
+  def close(self) -> None:
+    if self._file is not None:
+      self._file.close()
+      self._file = None
+
+  def _read(self) -> List[str]:
+    lines: List[str] = []
+    while True:
+      data = self._file.read(self.buflen) # type: ignore
+      if not data:
+        return lines
+      self._pos += len(data)
+      (head, sep, self._buf) = (self._buf + data).rpartition(b'\n')
+      if sep:
+        lines.extend(
+          line + '\n' for line in head.decode(self.encoding).split('\n'))
+
+  def read(self) -> List[str]:
+    '''
+    Return the complete lines appended to the file since the last call, with
+    their line terminators.
+    '''
+
+    if self._file is None and not self.open():
+      return []
+    lines = self._read()
+    try:
+      st = os.stat(self.path)
+    except FileNotFoundError:
+      # the file was moved or removed and not yet replaced; keep reading it
+      return lines
+    if (st.st_dev, st.st_ino) != self._ident:
+      # the file was replaced. drain the old file, including any final line
+      # without a terminator, then read the new file from its start
+      lines.extend(self._read())
+      if self._buf:
+        lines.append(self._buf.decode(self.encoding))
+      self.drained = (self._ident, self._pos) # type: ignore
+      if self.open():
+        lines.extend(self._read())
+    elif os.fstat(self._file.fileno()).st_size < self._pos: # type: ignore
+      # the file was truncated
+      log.debug(f'File truncated: {self.path}')
+      self.open()
+      lines.extend(self._read())
+    return lines
+
 def follow(
   path: str,
   interval: float = 0.5,
-  cond: Callable = lambda: True
+  cond: Callable = lambda: True,
+  encoding: Optional[str] = None,
 ) -> Generator[str, None, None]:
-  with open(path) as pathf:
-    buf = []
+  '''
+  Yield lines from a file as they are appended to it while `cond()` is True.
+
+  Changes are awaited with inotify where it is available, and otherwise by
+  polling the file every `interval` seconds. `cond()` is called at least
+  every `interval` seconds. The file is followed across truncation and
+  rotation as with `tail -F`.
+  '''
+
+  follower = _Follower(path, encoding)
+  if not follower.open():
+    raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+  inotify = _inotify()
+  try:
+    if inotify is not None:
+      inotify.watch(os.path.dirname(os.path.abspath(path)))
     while cond():
-      data = pathf.readline()
-      if data == '':
+      lines = follower.read()
+      yield from lines
+      if lines:
+        continue
+      if inotify is None:
         sleep(interval)
+      else:
+        inotify.wait(interval)
+  finally:
+    follower.close()
+    if inotify is not None:
+      inotify.close()
+
+def follow_many(
+  paths: Iterable[str],
+  interval: float = 0.5,
+  cond: Callable = lambda: True,
+  encoding: Optional[str] = None,
+  offsets: Optional[MutableMapping[str, int]] = None,
+  batch: bool = False,
+) -> Generator[Union[Tuple[str, str], List[Tuple[str, str]]], None, None]:
+  '''
+  Yield `(path, line)` for lines appended to many files while `cond()` is
+  True, or lists of `(path, line)` if `batch` is True.
+
+  `paths` may contain paths and glob patterns. Files which come to match a
+  pattern are followed from their start, and files matching a pattern are
+  forgotten once they are removed. Files are followed as with `follow()`,
+  from a single thread. Yielded paths are absolute.
+
+  If `offsets` is given, files are read from `offsets[path]` at the start,
+  and `offsets[path]` is updated to the end of the last line read from
+  `path` once all lines read from `path` in one pass have been consumed.
+  Persisting `offsets` allows a later call to resume where this one left
+  off; lines consumed after the last update are yielded again.
+  '''
+
+  if offsets is None:
+    offsets = {}
+  patterns = [os.path.abspath(path) for path in paths]
+  explicit = {path for path in patterns if not glob.has_magic(path)}
+  followers: Dict[str, _Follower] = {}
+  drained: Dict[Tuple[int, int], int] = {}
+  inotify = _inotify()
+
+  def scan() -> None:
+    for pattern in patterns:
+      if pattern in explicit:
+        (found, dirs) = ([pattern], [os.path.dirname(pattern)])
+      else:
+        found = glob.glob(pattern)
+        dirs = glob.glob(os.path.dirname(pattern))
+      if inotify is not None:
+        for dir in dirs:
+          if os.path.isdir(dir):
+            inotify.watch(dir)
+      for path in found:
+        if path not in followers:
+          follower = _Follower(path, encoding)
+          follower.open(offsets.get(path, 0)) # type: ignore
+          handover(follower)
+          followers[path] = follower
+
+  def handover(follower: _Follower) -> None:
+    # a file newly matching a pattern may be a followed file which was
+    # renamed, e.g. by log rotation. continue from where it was read to
+    ident = follower.ident
+    if ident is None:
+      return
+    if ident in drained:
+      follower.open(drained.pop(ident))
+      offsets[follower.path] = follower.offset # type: ignore
+      return
+    for other in followers.values():
+      if other.ident != ident:
         continue
-      if not data.endswith(os.linesep):
-        buf.append(data)
+      try:
+        st = os.stat(other.path)
+        if (st.st_dev, st.st_ino) == ident:
+          # the file is linked at both paths
+          return
+      except FileNotFoundError:
+        pass
+      follower.open(other.offset)
+      offsets[follower.path] = follower.offset # type: ignore
+      # the other path is followed from the start of the next file created
+      other.close()
+      offsets[other.path] = 0 # type: ignore
+      return
+
+  def collect(follower: _Follower) -> None:
+    # remember drained files so that they are not read again if they match
+    # a pattern under a new name
+    if follower.drained is not None:
+      (ident, offset) = follower.drained
+      follower.drained = None
+      drained[ident] = offset
+      while len(drained) > 1024:
+        del drained[next(iter(drained))]
+
+  try:
+    scan()
+    pending = set(followers)
+    while cond():
+      read = []
+      for path in sorted(pending):
+        follower = followers.get(path) # type: ignore
+        if follower is None:
+          continue
+        lines = follower.read()
+        collect(follower)
+        if lines:
+          read.append((follower, lines))
+        elif path not in explicit and not os.path.exists(path):
+          follower.close()
+          del followers[path]
+          offsets.pop(path, None)
+      if batch:
+        items = [(f.path, line) for (f, lines) in read for line in lines]
+        if items:
+          yield items
+        for (follower, _) in read:
+          offsets[follower.path] = follower.offset
+      else:
+        for (follower, lines) in read:
+          for line in lines:
+            yield (follower.path, line)
+          offsets[follower.path] = follower.offset
+      if read:
+        # files which were read may have more data
+        pending = {follower.path for (follower, _) in read}
         continue
-      yield ''.join(buf) + data
+      if inotify is None:
+        sleep(interval)
+        events = None
+      else:
+        events = inotify.wait(interval)
+      if not events:
+        # timeout or lost events. look for new files and read all files
+        scan()
+        pending = set(followers)
+        continue
+      if any(
+        path not in followers and any(fnmatch(path, p) for p in patterns)
+        for path in events
+      ):
+        scan()
+      pending = {path for path in events if path in followers}
+  finally:
+    for follower in followers.values():
+      follower.close()
+    if inotify is not None:
+      inotify.close()
+
+class _Reaper:
+  '''
+  Remove directory trees in a background thread. Trees are renamed before
+  they are queued, so their paths are free immediately. Queued trees are
+  removed before the interpreter exits.
+  '''
+
+  _queue: 'queue.Queue[str]'
+  _thread: Optional[Thread]
+  _lock: threading.Lock
+
+  def __init__(self) -> None:
+    super().__init__()
+    self._queue = queue.Queue()
+    self._thread = None
+    self._lock = threading.Lock()
+
+  def reap(self, path: str) -> None:
+    'Remove the tree at `path` in the background.'
+
+    try:
+      reaped = f'{path}.reap'
+      os.rename(path, reaped)
+      path = reaped
+    except OSError:
+      pass
+    with self._lock:
+      if self._thread is None:
+        self._thread = Thread.spawn(
+          target=self._work, name='TempDir reaper', daemon=True)
+        atexit.register(self.drain)
+    self._queue.put(path)
+
+  def drain(self) -> None:
+    'Wait for all queued trees to be removed.'
+
+    self._queue.join()
+
+  def _work(self) -> None:
+    while True:
+      path = self._queue.get()
+      try:
+        shutil.rmtree(path)
+      except Exception:
+        log.exception(f'Failed to remove temporary directory: {path}')
+      finally:
+        self._queue.task_done()
+
+_reaper = _Reaper()
 
 class TempDir:
+  '''
+  Context manager which creates a temporary directory and removes it on
+  exit, unless `keep` is True. If `background` is True, the directory is
+  removed by a background thread, so exit does not wait for large trees to
+  be removed.
+  '''
 
   _tempdir_suffix: Optional[str]
   _tempdir_prefix: Optional[str]
   _tempdir_root: Optional[str]
   _tempdir_keep: bool
+  _tempdir_background: bool
   _tempdir_dir: Optional[str]
 
   def __init__(
@@ -66,7 +800,8 @@ class TempDir:
     suffix: Optional[str] = None,
     prefix: Optional[str] = None,
     dir: Optional[str] = None,
-    keep: bool = False
+    keep: bool = False,
+    background: bool = False,
   ) -> None:
 
     super().__init__()
@@ -76,6 +811,7 @@ class TempDir:
     self._tempdir_prefix = prefix
     self._tempdir_root = dir
     self._tempdir_keep = keep
+    self._tempdir_background = background
     self._tempdir_dir = None
 
   def __enter__(self) -> str:
@@ -89,7 +825,10 @@ class TempDir:
       log.warn(f'Keeping temporary directory: {self._tempdir_dir}')
     else:
       if self._tempdir_dir:
-        shutil.rmtree(self._tempdir_dir)
+        if self._tempdir_background:
+          _reaper.reap(self._tempdir_dir)
+        else:
+          shutil.rmtree(self._tempdir_dir)
     self._tempdir_dir = None
 
 class TempFile(TempDir):
@@ -97,3 +836,126 @@ class TempFile(TempDir):
   def __enter__(self) -> str:
     temp_dir = super().__enter__()
     return os.path.join(temp_dir, 'file')
+
+class TempDirPool:
+  '''
+  Pool of temporary directories which are reused while they are empty.
+
+  Example:
+
+    > pool = TempDirPool()
+    > with pool.tempdir() as temp_dir:
+    >   ...
+
+  A directory is returned to the pool on exit if it is empty and still
+  private to the current user, and is otherwise removed in the background.
+  Idle directories are checked in the same way before they are reused, and
+  are replaced by new directories if they fail the check.
+  At most `size` idle directories are kept, and they are removed when the
+  interpreter exits.
+
+  If `shm` is True and `/dev/shm` is available, directories are created on
+  tmpfs under `/dev/shm` unless `dir` is given. Note that `/dev/shm` may be
+  mounted `noexec`.
+  '''
+
+  size: int
+
+  _suffix: Optional[str]
+  _prefix: str
+  _root: Optional[str]
+  _idle: List[str]
+  _lock: threading.Lock
+
+  def __init__(
+    self,
+    size: int = 8,
+    suffix: Optional[str] = None,
+    prefix: Optional[str] = None,
+    dir: Optional[str] = None,
+    shm: bool = False,
+  ) -> None:
+
+    super().__init__()
+    if dir is None and shm and os.access('/dev/shm', os.W_OK | os.X_OK):
+      dir = '/dev/shm'
+    self.size = size
+    self._suffix = suffix
+    self._prefix = 'lura.' if prefix is None else prefix
+    self._root = dir
+    self._idle = []
+    self._lock = threading.Lock()
+    atexit.register(self.clear)
+
+  def __len__(self) -> int:
+    return len(self._idle)
+
+  def _private(self, path: str) -> Optional[bool]:
+    '''
+    Return True if `path` is an empty directory, not a symlink, owned by the
+    current user with mode 0700, False if it is another directory owned by
+    the current user, or None otherwise.
+    '''
+
+    try:
+      st = os.lstat(path)
+      if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        return None
+      with os.scandir(path) as it:
+        empty = next(it, None) is None
+    except OSError:
+      return None
+    return empty and stat.S_IMODE(st.st_mode) == 0o700
+
+  def acquire(self) -> str:
+    '''
+    Return an idle directory, or a new directory if none are idle. Idle
+    directories are checked again before they are reused, since they may
+    have been removed or replaced, e.g. by a temporary file cleaner.
+    '''
+
+    while True:
+      with self._lock:
+        if not self._idle:
+          break
+        path = self._idle.pop()
+      private = self._private(path)
+      if private:
+        return path
+      if private is False:
+        _reaper.reap(path)
+    return tempfile.mkdtemp(
+      suffix=self._suffix, prefix=self._prefix, dir=self._root)
+
+  def release(self, path: str) -> None:
+    'Return directory `path` to the pool, or remove it if it is not reusable.'
+
+    private = self._private(path)
+    if private is None:
+      return
+    with self._lock:
+      if private and len(self._idle) < self.size:
+        self._idle.append(path)
+        return
+    _reaper.reap(path)
+
+  @contextmanager
+  def tempdir(self) -> Iterator[str]:
+    'Yield a directory from the pool, and release it on exit.'
+
+    path = self.acquire()
+    try:
+      yield path
+    finally:
+      self.release(path)
+
+  def clear(self) -> None:
+    'Remove all idle directories.'
+
+    with self._lock:
+      (idle, self._idle) = (self._idle, [])
+    for path in idle:
+      try:
+        os.rmdir(path)
+      except OSError:
+        shutil.rmtree(path, ignore_errors=True)
@@ -1,24 +1,61 @@
 import hashlib
+import io
+import mmap
+import os
+import stat
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import (
+  IO, Any, BinaryIO, Dict, Iterable, Iterator, List, Mapping, MutableMapping,
+  Optional, Sequence, Tuple, Union, TYPE_CHECKING
+)
+
+if TYPE_CHECKING:
+  import sqlite3
 
 class Settings:
+  '''
+  Hashing settings.
+
+  Files are read with `readinto()` into a reusable buffer of `buflen` bytes,
+  or memory-mapped when they are regular files of at least `mmap_min` bytes.
+  Set `mmap_min` to None to disable memory-mapping. Files which cannot be
+  mapped are read instead. Note that a process is killed by SIGBUS if a
+  mapped file is truncated while it is being hashed; disable memory-mapping
+  when hashing files which may be truncated, such as logs.
+
+  When `cache` is a `DigestCache`, file sums are looked up in and stored to
+  it by `hashf()`, `hashf_multi()`, and `checkf()`.
+  '''
 
-  __slots__ = ('buflen',)
+  __slots__ = ('buflen', 'mmap_min', 'cache')
 
   buflen: int
+  mmap_min: Optional[int]
+  cache: Optional['DigestCache']
 
   def __init__(self) -> None:
     super().__init__()
     self.buflen = 256 * 1024
+    self.mmap_min = 4 * 1024 * 1024
+    self.cache = None
 
 settings = Settings()
 
-def hash(buf: bytes, alg: str = 'sha512') -> str:
-  'Hash bytes.'
+def _new(alg: str) -> 'hashlib._Hash':
+  'Return a new hash object for `alg`.'
 
   algs = hashlib.algorithms_guaranteed
   if not alg in algs:
     raise ValueError(f'Algorithm {alg} not in {algs}')
-  impl = getattr(hashlib, alg)()
+  return getattr(hashlib, alg)()
+
+def hash(buf: Union[bytes, bytearray, memoryview], alg: str = 'sha512') -> str:
+  'Hash bytes or a bytes-like object, e.g. a view yielded by `fs.map()`.'
+
+  impl = _new(alg)
   impl.update(buf)
   return str(impl.hexdigest())
 
@@ -27,21 +64,197 @@ def hashs(buf: str, alg: str ='sha512') -> str:
 
   return hash(buf.encode(), alg=alg)
 
+def _chunks(fd: BinaryIO) -> Iterator[memoryview]:
+  '''
+  Yield the remaining contents of binary file `fd` as memoryviews, which are
+  only valid until the next chunk is requested.
+  '''
+
+  st = os.fstat(fd.fileno())
+  size = st.st_size if stat.S_ISREG(st.st_mode) else -1
+  buflen = settings.buflen
+  mmap_min = settings.mmap_min
+  map = None
+  if mmap_min is not None and size >= max(mmap_min, 1):
+    try:
+      map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+      # some filesystems, e.g. fuse with direct_io, cannot be mapped
+      pass
+  if map is not None:
+    try:
+      with memoryview(map) as view:
+        for pos in range(fd.tell(), len(view), buflen):
+          yield view[pos:pos + buflen]
+        fd.seek(len(view))
+    finally:
+      try:
+        map.close()
+      except BufferError:
+        # the caller still holds the last chunk; the map is closed when it
+        # is collected
+        pass
+    return
+  if 0 <= size <= buflen:
+    # small files are read in one call without allocating a buffer
+    yield memoryview(fd.read())
+    return
+  buf = bytearray(buflen)
+  view = memoryview(buf)
+  while True:
+    n = fd.readinto(buf) # type: ignore
+    if not n:
+      break
+    yield view[:n]
+
 def hashf(path: str, alg: str = 'sha512') -> str:
   'Hash a file.'
 
-  algs = hashlib.algorithms_guaranteed
-  if not alg in algs:
-    raise ValueError(f'Algorithm {alg} not in {algs}')
-  impl = getattr(hashlib, alg)()
-  with open(path, 'rb') as fd:
-    while True:
-      buf = fd.read(settings.buflen)
-      if buf == b'':
-        break
-      impl.update(buf)
+  if settings.cache is not None:
+    return settings.cache.hashf_multi(path, (alg,))[alg]
+  impl = _new(alg)
+  with open(path, 'rb', buffering=0) as fd:
+    for chunk in _chunks(fd):
+      impl.update(chunk)
+  return str(impl.hexdigest())
+
+def hashiter(chunks: Iterable[bytes], alg: str = 'sha512') -> str:
+  'Hash an iterable of bytes-like objects.'
+
+  impl = _new(alg)
+  for chunk in chunks:
+    impl.update(chunk)
   return str(impl.hexdigest())
-       
+
+def hashfd(fd: IO, alg: str = 'sha512') -> str:
+  '''
+  Hash the remaining contents of a file object. Text file objects are
+  hashed as their encoded contents.
+  '''
+
+  if isinstance(fd, (io.FileIO, io.BufferedReader)):
+    return hashiter(_chunks(fd), alg) # type: ignore
+  if isinstance(fd, io.TextIOBase):
+    encoding = fd.encoding or 'utf-8'
+    return hashiter(
+      (buf.encode(encoding) for buf in iter(lambda: fd.read(settings.buflen), '')),
+      alg,
+    )
+  return hashiter(iter(lambda: fd.read(settings.buflen), b''), alg)
+
+class HashSink:
+  '''
+  File-like object which hashes the data written to it.
+
+  A sink may be used as a `run()` output target to hash a command's output
+  as it is produced:
+
+    > from lura.run import run
+    > sink = HashSink('sha256')
+    > run(['tar', 'c', 'dist'], stdout=[sink], text=False)
+    > sink.hexdigest()
+
+  Sinks are binary by default. When `text` is True, the sink accepts str,
+  which is encoded with `encoding` before hashing.
+  '''
+
+  alg: str
+  mode: str
+  encoding: Optional[str]
+  closed: bool
+
+  _impl: 'hashlib._Hash'
+
+  def __init__(
+    self,
+    alg: str = 'sha512',
+    text: bool = False,
+    encoding: str = 'utf-8',
+  ) -> None:
+
+    super().__init__()
+    self._impl = _new(alg)
+    self.alg = alg
+    self.mode = 'w' if text else 'wb'
+    self.encoding = encoding if text else None
+    self.closed = False
+
+  def __enter__(self) -> 'HashSink':
+    return self
+
+  def __exit__(self, *exc_info: Any) -> None:
+    self.close()
+
+  def writable(self) -> bool:
+    return True
+
+  def write(self, buf: Union[str, bytes]) -> int:
+    if self.closed:
+      raise ValueError('I/O operation on closed sink')
+    if self.encoding is None:
+      self._impl.update(buf) # type: ignore
+    else:
+      self._impl.update(buf.encode(self.encoding)) # type: ignore
+    return len(buf)
+
+  def flush(self) -> None:
+    pass
+
+  def close(self) -> None:
+    self.closed = True
+
+  def digest(self) -> bytes:
+    'Return the digest of the data written so far.'
+
+    return bytes(self._impl.digest())
+
+  def hexdigest(self) -> str:
+    'Return the sum of the data written so far.'
+
+    return str(self._impl.hexdigest())
+
+def hash_multi(
+  buf: Union[bytes, bytearray, memoryview],
+  algs: Sequence[str] = ('sha256', 'sha512', 'md5'),
+) -> Dict[str, str]:
+  'Hash bytes with each of `algs` and return a dict of sums by algorithm.'
+
+  sums = {}
+  for alg in algs:
+    impl = _new(alg)
+    impl.update(buf)
+    sums[alg] = str(impl.hexdigest())
+  return sums
+
+def hashs_multi(
+  buf: str,
+  algs: Sequence[str] = ('sha256', 'sha512', 'md5'),
+) -> Dict[str, str]:
+  'Hash a string with each of `algs` and return a dict of sums by algorithm.'
+
+  return hash_multi(buf.encode(), algs=algs)
+
+def hashf_multi(
+  path: str,
+  algs: Sequence[str] = ('sha256', 'sha512', 'md5'),
+) -> Dict[str, str]:
+  '''
+  Hash a file with each of `algs`, reading it once, and return a dict of
+  sums by algorithm.
+  '''
+
+  if settings.cache is not None:
+    return settings.cache.hashf_multi(path, algs)
+  return _hashf_multi(path, algs)
+
+def _hashf_multi(path: str, algs: Sequence[str]) -> Dict[str, str]:
+  impls = {alg: _new(alg) for alg in algs}
+  with open(path, 'rb', buffering=0) as fd:
+    for chunk in _chunks(fd):
+      for impl in impls.values():
+        impl.update(chunk)
+  return {alg: str(impl.hexdigest()) for (alg, impl) in impls.items()}
+
 class HashError(ValueError):
 
   def __init__(self, path: str, alg: str, expected: str, received: str) -> None:
@@ -52,9 +265,665 @@ class HashError(ValueError):
     self.expected = expected
     self.received = received
 
-def checkf(path: str, alg: str, sum: str) -> None:
-  'Raise `HashError` if the sum of `path` for `alg` does not match `sum`.'
+def checkf(
+  path: str,
+  alg: Union[str, Mapping[str, str]],
+  sum: Optional[str] = None,
+) -> None:
+  '''
+  Raise `HashError` if the sum of `path` for `alg` does not match `sum`.
+
+  `alg` may instead be a mapping of algorithms to expected sums, in which
+  case the file is read once and `HashError` is raised for the first sum in
+  the mapping which does not match.
+  '''
+
+  if isinstance(alg, str):
+    if sum is None:
+      raise ValueError('sum is required when alg is an algorithm name')
+    sums = {alg: sum}
+  else:
+    sums = dict(alg)
+  sums2 = hashf_multi(path, tuple(sums))
+  for (alg2, sum) in sums.items():
+    if sum != sums2[alg2]:
+      raise HashError(path, alg2, sum, sums2[alg2])
+
+def ihashf_many(
+  paths: Iterable[str],
+  alg: str = 'sha512',
+  workers: Optional[int] = None,
+) -> Iterator[Tuple[str, Optional[str], Optional[Exception]]]:
+  '''
+  Hash files in a pool of `workers` threads and yield `(path, sum, None)`
+  for each file as it is hashed, or `(path, None, exception)` for each file
+  which could not be hashed.
+  '''
+
+  with ThreadPoolExecutor(max_workers=workers) as pool:
+    futures = {pool.submit(hashf, path, alg): path for path in paths}
+    try:
+      for future in as_completed(futures):
+        error = future.exception()
+        if error is None:
+          yield (futures[future], future.result(), None)
+        else:
+          yield (futures[future], None, error) # type: ignore
+    finally:
+      for future in futures:
+        future.cancel()
+
+def hashf_many(
+  paths: Iterable[str],
+  alg: str = 'sha512',
+  workers: Optional[int] = None,
+  errors: Optional[MutableMapping[str, Exception]] = None,
+) -> Dict[str, str]:
+  '''
+  Hash files in a pool of `workers` threads and return a dict of their sums.
+
+  Exceptions raised while hashing are stored in `errors` by path if it is
+  not None, else the first exception is raised once all files are hashed.
+  '''
+
+  paths = list(paths)
+  sums = {}
+  failed = {}
+  for (path, sum, error) in ihashf_many(paths, alg, workers):
+    if error is None:
+      sums[path] = sum
+    else:
+      failed[path] = error
+  if errors is not None:
+    errors.update(failed)
+  elif failed:
+    raise next(iter(failed.values()))
+  return {path: sums[path] for path in paths if path in sums} # type: ignore
+
+class HashErrors(ValueError):
+  'Raised by `checkf_many()` with the errors for all files which failed.'
+
+  def __init__(self, errors: Mapping[str, Exception]) -> None:
+    msg = f'{len(errors)} files failed verification:\n' + '\n'.join(
+      str(error) if isinstance(error, HashError) else f'{path}: {error}'
+      for (path, error) in errors.items()
+    )
+    super().__init__(msg)
+    self.errors = errors
+
+def checkf_many(
+  sums: Mapping[str, str],
+  alg: str,
+  workers: Optional[int] = None,
+) -> None:
+  '''
+  Verify the files named by the keys of `sums` in a pool of `workers`
+  threads, and raise `HashErrors` if the sum of any file for `alg` does not
+  match its value in `sums` or any file could not be hashed.
+  '''
+
+  errors: Dict[str, Exception] = {}
+  for (path, sum, error) in ihashf_many(sums, alg, workers):
+    if error is not None:
+      errors[path] = error
+    elif sum != sums[path]:
+      errors[path] = HashError(path, alg, sums[path], sum) # type: ignore
+  if errors:
+    raise HashErrors({path: errors[path] for path in sums if path in errors})
+
+def _signature(st: os.stat_result) -> Tuple[int, int, int, int, int]:
+  return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+class DigestCache:
+  '''
+  Persistent cache of file sums, stored in an sqlite database.
+
+  Example:
+
+    > from lura import hash
+    > hash.settings.cache = hash.DigestCache()
+    > hash.checkf('release.tar', 'sha256', sum)
+
+  Entries are keyed on the absolute path and algorithm, and are valid only
+  while the file's `(st_dev, st_ino, st_size, st_mtime_ns, st_ctime_ns)`
+  match the values recorded when it was hashed. A file which is replaced,
+  modified, or has its mtime reset with `utime()` (which updates the ctime)
+  is therefore hashed again.
+
+  Sums are not stored for files modified less than `racy` seconds before
+  they were hashed, since a further change within the resolution of the
+  filesystem's timestamps would not alter the mtime, nor when the file is
+  found to have changed while it was being hashed. Only regular files are
+  cached.
+
+  The database is `path`, or `$XDG_CACHE_HOME/lura/digests.sqlite` if
+  `path` is None. It is bounded by `max_entries`, evicting the least
+  recently used entries, which may be None. The database may be shared by
+  threads and processes.
+  '''
+
+  path: str
+  max_entries: Optional[int]
+  racy: float
+  hits: int
+  misses: int
+  stores: int
+  evictions: int
+
+  _db: 'sqlite3.Connection'
+  _lock: threading.Lock
+
+  def __init__(
+    self,
+    path: Optional[str] = None,
+    max_entries: Optional[int] = 100000,
+    racy: float = 2.0,
+  ) -> None:
+
+    super().__init__()
+    if path is None:
+      root = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+      path = os.path.join(root, 'lura', 'digests.sqlite')
+    if path != ':memory:':
+      os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    self.path = path
+    self.max_entries = max_entries
+    self.racy = racy
+    self.hits = 0
+    self.misses = 0
+    self.stores = 0
+    self.evictions = 0
+    self._lock = threading.Lock()
+    # imported here so that lura.hash does not require sqlite
+    import sqlite3
+    self._db = sqlite3.connect(
+      path, timeout=30, isolation_level=None, check_same_thread=False)
+    if path != ':memory:':
+      self._db.execute('pragma journal_mode = wal')
+    self._db.execute('''
+      create table if not exists digests (
+        path text not null,
+        alg text not null,
+        dev integer not null,
+        ino integer not null,
+        size integer not null,
+        mtime_ns integer not null,
+        ctime_ns integer not null,
+        sum text not null,
+        used real not null,
+        primary key (path, alg)
+      )
+    ''')
+    self._db.execute(
+      'create index if not exists digests_used on digests (used)')
+
+  def __len__(self) -> int:
+    with self._lock:
+      return self._db.execute('select count(*) from digests').fetchone()[0]
+
+  @property
+  def stats(self) -> Dict[str, int]:
+    'Cache metrics.'
+
+    entries = len(self)
+    with self._lock:
+      return dict(
+        entries = entries,
+        hits = self.hits,
+        misses = self.misses,
+        stores = self.stores,
+        evictions = self.evictions,
+      )
+
+  def hashf(self, path: str, alg: str = 'sha512') -> str:
+    'Return the sum of `path` for `alg`, hashing the file only on a miss.'
+
+    return self.hashf_multi(path, (alg,))[alg]
+
+  def hashf_multi(
+    self,
+    path: str,
+    algs: Sequence[str] = ('sha256', 'sha512', 'md5'),
+  ) -> Dict[str, str]:
+    '''
+    Return a dict of the sums of `path` for `algs`, reading the file once
+    for all algorithms which miss.
+    '''
+
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    if not stat.S_ISREG(st.st_mode):
+      return _hashf_multi(path, algs)
+    sig = _signature(st)
+    sums = self._get(path, algs, sig)
+    missing = [alg for alg in algs if alg not in sums]
+    if missing:
+      sums.update(_hashf_multi(path, missing))
+      # stat again so that a change made while hashing is not stored
+      if (
+        _signature(os.stat(path)) == sig and
+        st.st_mtime_ns < time.time_ns() - int(self.racy * 1e9)
+      ):
+        self._put(path, {alg: sums[alg] for alg in missing}, sig)
+    return {alg: sums[alg] for alg in algs}
+
+  def invalidate(self, path: Optional[str] = None) -> None:
+    'Remove all entries for `path`, or all entries if `path` is None.'
+
+    with self._lock:
+      if path is None:
+        self._db.execute('delete from digests')
+      else:
+        self._db.execute(
+          'delete from digests where path = ?', (os.path.abspath(path),))
+
+  def clear(self) -> None:
+    'Remove all entries and reset metrics.'
+
+    with self._lock:
+      self._db.execute('delete from digests')
+      self.hits = self.misses = self.stores = self.evictions = 0
+
+  def close(self) -> None:
+    'Close the database.'
+
+    with self._lock:
+      self._db.close()
+
+  def _get(
+    self,
+    path: str,
+    algs: Sequence[str],
+    sig: Tuple[int, int, int, int, int],
+  ) -> Dict[str, str]:
+
+    with self._lock:
+      rows = self._db.execute(
+        '''
+          select alg, dev, ino, size, mtime_ns, ctime_ns, sum
+          from digests where path = ?
+        ''',
+        (path,),
+      ).fetchall()
+      sums = {
+        row[0]: row[6] for row in rows
+        if row[0] in algs and tuple(row[1:6]) == sig
+      }
+      self.hits += len(sums)
+      self.misses += len(algs) - len(sums)
+      if sums:
+        self._db.executemany(
+          'update digests set used = ? where path = ? and alg = ?',
+          [(time.time(), path, alg) for alg in sums],
+        )
+      return sums
+
+  def _put(
+    self,
+    path: str,
+    sums: Mapping[str, str],
+    sig: Tuple[int, int, int, int, int],
+  ) -> None:
+
+    with self._lock:
+      now = time.time()
+      self._db.executemany(
+        'insert or replace into digests values (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [(path, alg) + sig + (sum, now) for (alg, sum) in sums.items()],
+      )
+      self.stores += len(sums)
+      self._prune()
+
+  def _prune(self) -> None:
+    if self.max_entries is None:
+      return
+    count = self._db.execute('select count(*) from digests').fetchone()[0]
+    if count <= self.max_entries:
+      return
+    self._db.execute(
+      '''
+        delete from digests where rowid in (
+          select rowid from digests order by used limit ?
+        )
+      ''',
+      (count - self.max_entries,),
+    )
+    self.evictions += count - self.max_entries
+
+# identity and version of a file in a HashTree
+_TreeSignature = Tuple[int, int, int, int]
+
+class HashTree:
+  '''
+  Digests of a directory tree, as returned by `hashtree()`.
+
+  `files` maps the relative paths of files and symlinks to their sums, and
+  `dirs` maps the relative paths of directories, with the root directory
+  named `.`, to their sums. `root` is the sum of the root directory.
+  '''
+
+  alg: str
+  root: str
+  files: Dict[str, str]
+  dirs: Dict[str, str]
+  stats: Dict[str, int]
+
+  _signatures: Dict[str, _TreeSignature]
+
+  def __init__(
+    self,
+    alg: str,
+    root: str,
+    files: Dict[str, str],
+    dirs: Dict[str, str],
+    stats: Optional[Dict[str, int]] = None,
+    signatures: Optional[Dict[str, _TreeSignature]] = None,
+  ) -> None:
+
+    super().__init__()
+    self.alg = alg
+    self.root = root
+    self.files = files
+    self.dirs = dirs
+    self.stats = stats or {}
+    self._signatures = signatures or {}
+
+  def __repr__(self) -> str:
+    return f'<HashTree {self.alg} {self.root}>'
+
+  def __eq__(self, other: Any) -> bool:
+    if not isinstance(other, HashTree):
+      return NotImplemented
+    return self.alg == other.alg and self.root == other.root
+
+  def diff(self, other: 'HashTree') -> Dict[str, List[str]]:
+    '''
+    Return the relative paths of the files which were `added`, `removed`, or
+    `changed` in this tree relative to `other`.
+    '''
+
+    if self.alg != other.alg:
+      raise ValueError(f'Cannot compare {self.alg} tree to {other.alg} tree')
+    return dict(
+      added = sorted(set(self.files) - set(other.files)),
+      removed = sorted(set(other.files) - set(self.files)),
+      changed = sorted(
+        path for (path, sum) in self.files.items()
+        if path in other.files and other.files[path] != sum
+      ),
+    )
+
+  def to_dict(self) -> Dict[str, Any]:
+    'Return a dict of this tree which may be serialized, e.g. as json.'
+
+    return dict(
+      alg = self.alg,
+      root = self.root,
+      files = dict(self.files),
+      dirs = dict(self.dirs),
+      signatures = {k: list(v) for (k, v) in self._signatures.items()},
+    )
+
+  @classmethod
+  def from_dict(cls, data: Mapping[str, Any]) -> 'HashTree':
+    'Return a tree from the output of `to_dict()`.'
+
+    return cls(
+      data['alg'],
+      data['root'],
+      dict(data['files']),
+      dict(data['dirs']),
+      signatures = {
+        k: tuple(v) for (k, v) in data.get('signatures', {}).items()
+      },
+    )
+
+def _tree_signature(st: os.stat_result) -> _TreeSignature:
+  return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+def hashtree(
+  path: str,
+  alg: str = 'sha512',
+  workers: Optional[int] = None,
+  previous: Optional[HashTree] = None,
+) -> HashTree:
+  '''
+  Hash the directory tree at `path`, hashing files in a pool of `workers`
+  threads, and return a `HashTree`.
+
+  The sum of a directory is the hash of its sorted entries, each of which
+  is a type (`f`, `l`, or `d`), the sum of the entry, and its name. The sum
+  of a symlink is the hash of its target, which is not followed. Other
+  kinds of files are ignored. The root sum therefore depends only on names,
+  contents, and link targets, and is the same for copies of a tree.
+
+  When `previous` is a tree returned by an earlier call for the same
+  directory, files whose inode, size, mtime, and ctime are unchanged are
+  not hashed again.
+  '''
+
+  _new(alg)
+  if previous is not None and previous.alg != alg:
+    raise ValueError(f'Cannot update {previous.alg} tree with {alg}')
+  # entries of each directory by relative path, as (type, name, relpath)
+  entries: Dict[str, List[Tuple[str, str, str]]] = {}
+  files: Dict[str, str] = {}
+  signatures: Dict[str, _TreeSignature] = {}
+  pending: Dict[str, str] = {}
+  stats = dict(files=0, links=0, dirs=0, hashed=0, reused=0, bytes=0)
+  stack = ['.']
+  while stack:
+    dir = stack.pop()
+    entries[dir] = []
+    with os.scandir(os.path.join(path, dir)) as it:
+      for entry in it:
+        rel = entry.name if dir == '.' else f'{dir}/{entry.name}'
+        if entry.is_symlink():
+          files[rel] = hash(os.fsencode(os.readlink(entry.path)), alg)
+          entries[dir].append(('l', entry.name, rel))
+          stats['links'] += 1
+        elif entry.is_dir():
+          stack.append(rel)
+          entries[dir].append(('d', entry.name, rel))
+        elif entry.is_file():
+          sig = _tree_signature(entry.stat())
+          signatures[rel] = sig
+          if (
+            previous is not None and rel in previous.files and
+            previous._signatures.get(rel) == sig
+          ):
+            files[rel] = previous.files[rel]
+            stats['reused'] += 1
+          else:
+            pending[rel] = entry.path
+            stats['bytes'] += sig[1]
+          entries[dir].append(('f', entry.name, rel))
+          stats['files'] += 1
+  if pending:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+      sums = pool.map(lambda p: hashf(p, alg), pending.values())
+      files.update(zip(pending, sums))
+    stats['hashed'] = len(pending)
+  dirs: Dict[str, str] = {}
+  # hash directories deepest first, so subdirectories are hashed before
+  # their parents
+  depth = lambda dir: 0 if dir == '.' else dir.count('/') + 1
+  for dir in sorted(entries, key=depth, reverse=True):
+    impl = _new(alg)
+    children = sorted(entries[dir], key=lambda e: os.fsencode(e[1]))
+    for (type, name, rel) in children:
+      sum = dirs[rel] if type == 'd' else files[rel]
+      impl.update(f'{type} {sum} '.encode() + os.fsencode(name) + b'\0')
+    dirs[dir] = str(impl.hexdigest())
+  stats['dirs'] = len(dirs)
+  return HashTree(alg, dirs['.'], files, dirs, stats, signatures)
+
+class Manifest:
+  '''
+  Block digests of a file, as returned by `manifest()`.
+
+  `blocks` holds the sum of each `blocksize` block of the file, the last of
+  which may be short. `root` is the hash of the file size, the block size,
+  and the digests of the blocks, and so identifies the file's contents.
+  '''
+
+  alg: str
+  blocksize: int
+  size: int
+  blocks: List[str]
+  root: str
+
+  def __init__(
+    self,
+    alg: str,
+    blocksize: int,
+    size: int,
+    blocks: List[str],
+  ) -> None:
+
+    super().__init__()
+    self.alg = alg
+    self.blocksize = blocksize
+    self.size = size
+    self.blocks = blocks
+    impl = _new(alg)
+    impl.update(f'{size}:{blocksize}:'.encode())
+    for block in blocks:
+      impl.update(bytes.fromhex(block))
+    self.root = str(impl.hexdigest())
+
+  def __repr__(self) -> str:
+    return f'<Manifest {self.alg} {self.root}>'
+
+  def __eq__(self, other: Any) -> bool:
+    if not isinstance(other, Manifest):
+      return NotImplemented
+    return self.alg == other.alg and self.root == other.root
+
+  def range(self, index: int) -> Tuple[int, int]:
+    'Return the `(start, end)` byte range of block `index`.'
+
+    start = index * self.blocksize
+    return (start, min(start + self.blocksize, self.size))
+
+  def to_dict(self) -> Dict[str, Any]:
+    'Return a dict of this manifest which may be serialized, e.g. as json.'
+
+    return dict(
+      alg = self.alg,
+      blocksize = self.blocksize,
+      size = self.size,
+      blocks = list(self.blocks),
+      root = self.root,
+    )
+
+  @classmethod
+  def from_dict(cls, data: Mapping[str, Any]) -> 'Manifest':
+    'Return a manifest from the output of `to_dict()`.'
+
+    manifest = cls(data['alg'], data['blocksize'], data['size'], list(data['blocks']))
+    if 'root' in data and data['root'] != manifest.root:
+      raise ValueError(f'Manifest root {data["root"]} does not match its blocks')
+    return manifest
+
+def _block_sums(
+  fd: int,
+  size: int,
+  alg: str,
+  blocksize: int,
+  workers: Optional[int],
+) -> Iterator[str]:
+  '''
+  Yield the sum of each `blocksize` block of the first `size` bytes of the
+  file open as `fd`, in order, reading blocks with `pread()` in a pool of
+  `workers` threads.
+  '''
+
+  _new(alg)
+
+  def sum(offset: int) -> str:
+    impl = _new(alg)
+    impl.update(os.pread(fd, min(blocksize, size - offset), offset))
+    return str(impl.hexdigest())
+
+  if workers is None:
+    workers = min(32, (os.cpu_count() or 1) + 4)
+  # bound the number of blocks in flight so memory use does not depend on
+  # the file size
+  limit = 2 * workers
+  with ThreadPoolExecutor(max_workers=workers) as pool:
+    futures: 'deque[Future]' = deque()
+    offsets = iter(range(0, size, blocksize))
+    try:
+      for offset in offsets:
+        futures.append(pool.submit(sum, offset))
+        if len(futures) >= limit:
+          yield futures.popleft().result()
+      while futures:
+        yield futures.popleft().result()
+    finally:
+      for future in futures:
+        future.cancel()
+
+def manifest(
+  path: str,
+  alg: str = 'sha256',
+  blocksize: int = 4 * 1024 * 1024,
+  workers: Optional[int] = None,
+) -> Manifest:
+  '''
+  Hash each `blocksize` block of a file in a pool of `workers` threads and
+  return a `Manifest`.
+  '''
+
+  if blocksize < 1:
+    raise ValueError(f'Invalid block size: {blocksize}')
+  fd = os.open(path, os.O_RDONLY)
+  try:
+    size = os.fstat(fd).st_size
+    blocks = list(_block_sums(fd, size, alg, blocksize, workers))
+  finally:
+    os.close(fd)
+  return Manifest(alg, blocksize, size, blocks)
+
+def verify_manifest(
+  path: str,
+  manifest: Manifest,
+  first: bool = False,
+  workers: Optional[int] = None,
+) -> List[Tuple[int, int]]:
+  '''
+  Compare a file to `manifest` and return the `(start, end)` byte ranges
+  which differ, with adjacent ranges merged. Data present in only one of
+  the file and the manifest is reported as differing. The file matches the
+  manifest if the list is empty.
+
+  When `first` is True, return after the first differing range is found.
+  '''
+
+  blocksize = manifest.blocksize
+  ranges: List[Tuple[int, int]] = []
+
+  def differ(start: int, end: int) -> None:
+    if ranges and ranges[-1][1] == start:
+      ranges[-1] = (ranges[-1][0], end)
+    else:
+      ranges.append((start, end))
 
-  sum2 = hashf(path, alg)
-  if sum != sum2:
-    raise HashError(path, alg, sum, sum2)
+  fd = os.open(path, os.O_RDONLY)
+  try:
+    size = os.fstat(fd).st_size
+    end = max(size, manifest.size)
+    sums = _block_sums(fd, size, manifest.alg, blocksize, workers)
+    try:
+      for (index, offset) in enumerate(range(0, end, blocksize)):
+        sum = next(sums, None)
+        if index >= len(manifest.blocks) or sum != manifest.blocks[index]:
+          differ(offset, min(offset + blocksize, end))
+          if first:
+            break
+    finally:
+      sums.close()
+  finally:
+    os.close(fd)
+  return ranges
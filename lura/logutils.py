@@ -32,7 +32,6 @@ import os
 import sys
 import time
 import traceback
-import yaml as pyyaml
 from collections import defaultdict
 from io import StringIO
 from lura.attrs import attr
@@ -221,6 +220,7 @@ def add_level(name: str, number: int, char: Optional[str] = None) -> None:
 ## application-level configurator
 
 def yaml(string: str):
+  import yaml as pyyaml
   return pyyaml.safe_load(string)
 
 class Configurator:
@@ -259,44 +259,48 @@ class Configurator:
 
   @property
   def filters(self) -> Dict[str, Any]:
-    filters = yaml('extra_info: {}')
-    filters['extra_info']['()'] = ExtraInfoFilter
-    return filters
+    return {
+      'extra_info': {
+        '()': ExtraInfoFilter,
+      },
+    }
 
   @property
   def formatters(self) -> Dict[str, Any]:
-    formatters = yaml(f'''
-      multiline:
-        format: '{self.format}'
-        datefmt: '{self.datefmt}'
-    ''')
-    formatters['multiline']['()'] = MultiLineFormatter
-    return formatters
+    return {
+      'multiline': {
+        '()': MultiLineFormatter,
+        'format': self.format,
+        'datefmt': self.datefmt,
+      },
+    }
 
   @property
   def handlers(self) -> Dict[str, Any]:
-    return yaml('''
-      stderr:
-        class: logging.StreamHandler
-        stream: ext://sys.stderr
-        filters: [extra_info]
-        formatter: multiline
-    ''')
+    return {
+      'stderr': {
+        'class': 'logging.StreamHandler',
+        'stream': 'ext://sys.stderr',
+        'filters': ['extra_info'],
+        'formatter': 'multiline',
+      },
+    }
 
   @property
   def loggers(self) -> Dict[str, Any]:
-    return yaml(f'''
-      {self.package}:
-        handlers: [stderr]
-        level: {name_for_number(self.level)}
-    ''')
+    return {
+      self.package: {
+        'handlers': ['stderr'],
+        'level': name_for_number(self.level),
+      },
+    }
 
   @property
   def config(self) -> Dict[str, Any]:
-    config = yaml('''
-      version: 1
-      disable_existing_loggers: false
-    ''')
+    config: Dict[str, Any] = {
+      'version': 1,
+      'disable_existing_loggers': False,
+    }
     config['filters'] = self.filters
     config['formatters'] = self.formatters
     config['handlers'] = self.handlers
@@ -87,10 +87,11 @@ class RunResult:
   stderr: Union[bytes, str]
   # stderr as bytes or str
 
-  def format(self) -> str: ...
-  # return instance variable names and values as yaml string
+  def format(self, truncate=None) -> str: ...
+  # return instance variable names and values as yaml string. strings are
+  # truncated to `truncate` characters if it is not None
 
-  def print(self, file=None) -> None: ...
+  def print(self, file=None, truncate=None) -> None: ...
   # print instance variable names and values as yaml string. prints to stdout
   # if file is None
 ```
@@ -149,7 +150,7 @@ from copy import deepcopy
 from enum import Enum
 from lura.attrs import attr
 from lura.formats import Pyaml
-from lura.fs import TempDir
+from lura.fs import TempDirPool
 from lura.threads import Thread
 from subprocess import list2cmdline as shjoin
 from typing import (
@@ -190,7 +191,7 @@ class RunResult:
     self.stdout = stdout
     self.stderr = stderr
 
-  def format(self) -> str:
+  def format(self, truncate: Optional[int] = None) -> str:
     return Pyaml().dumps({
       'run': {
         'argv': self.args,
@@ -198,11 +199,11 @@ class RunResult:
         'stdout': self.stdout,
         'stderr': self.stderr,
       }
-    })
+    }, fast=True, truncate=truncate)
 
-  def print(self, file=None) -> None:
+  def print(self, file=None, truncate: Optional[int] = None) -> None:
     file = sys.stdout if file is None else file
-    file.write(self.format())
+    file.write(self.format(truncate))
 
 class RunError(RuntimeError):
   'Raised by run() when a subprocess exits with an unexpected code.'
@@ -659,6 +660,10 @@ class SudoContext(threading.local):
     self.login = None
     self.preserve_env = None
 
+# directories for askpass scripts. /dev/shm is not used because it may be
+# mounted noexec
+_askpass_dirs = TempDirPool()
+
 class Sudo:
   'Run commands in subprocesses with sudo.'
 
@@ -748,7 +753,7 @@ sys.stdout.flush()
 
     # run sudo with a password
     else:
-      with TempDir() as temp_dir:
+      with _askpass_dirs.tempdir() as temp_dir:
 
         # setup the path to the askpass script
         askpass_path = os.path.join(temp_dir, 'file')
@@ -763,8 +768,12 @@ sys.stdout.flush()
           b64password = b64encode(args.password.encode()).decode(),
         ))
 
-        # write the askpass script to temp file
-        with open(askpass_path, 'w') as askpass_fd:
+        # write the askpass script to temp file. create it exclusively and
+        # never through a symlink, since the directory may be reused
+        fd = os.open(
+          askpass_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW,
+          0o700)
+        with open(fd, 'w') as askpass_fd:
           askpass_fd.write(askpass_script)
         os.chmod(askpass_path, 0o700)
 
@@ -775,10 +784,17 @@ sys.stdout.flush()
           env = dict(env) # don't modify the caller's dict
         env['SUDO_ASKPASS'] = askpass_path
 
-        return run(
-          sudo_argv, env=env, env_replace=env_replace, cwd=cwd, shell=shell,
-          stdin=stdin, stdout=stdout, stderr=stderr, enforce=enforce,
-          enforce_code=enforce_code, text=text, encoding=encoding)
+        try:
+          return run(
+            sudo_argv, env=env, env_replace=env_replace, cwd=cwd, shell=shell,
+            stdin=stdin, stdout=stdout, stderr=stderr, enforce=enforce,
+            enforce_code=enforce_code, text=text, encoding=encoding)
+        finally:
+          # the script removes itself when run, but sudo may not run it.
+          # remove it so the password is not left on disk and the directory
+          # may be reused
+          if os.path.exists(askpass_path):
+            os.unlink(askpass_path)
   
   def zero(
     self,
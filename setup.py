@@ -6,7 +6,7 @@ author           = 'Nick Zigarovich'
 author_email     = 'nick@zigarovich.io'
 url              = 'https://github.com/ecks0/lura'
 description      = 'a bag of tricks'
-python_requires  = '>= 3.6'
+python_requires  = '>= 3.7'
 install_requires = open('requirements.txt').read().strip().splitlines()
 packages         = find_packages()
 console_scripts  = []